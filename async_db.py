@@ -0,0 +1,125 @@
+'''
+The async_db module provides asyncio counterparts of the data access functions in
+mysql_connector and log_stats (plus log_writer.log_query and flush).
+
+Every coroutine has the same signature and returns the same result as the function
+it wraps. pymysql and pymongo are blocking, so the calls run on a dedicated thread
+pool of settings.ASYNC_DB_WORKERS threads, separate from the event loop's default
+executor. Pass a settings.MySQLPool as `conn` so concurrent calls use separate
+connections. Independent work can then run concurrently:
+
+    films, _, top = await asyncio.gather(
+        async_db.search_by_keyword(pool, 'love'),
+        async_db.log_query('keyword', {'keyword': 'love'}),
+        async_db.get_top_queries(),
+    )
+
+mysql_connector.stream_search becomes an async iterator that fetches its rows in
+batches on the thread pool:
+
+    async for film in async_db.stream_search(pool, 'keyword', {'keyword': 'love'}):
+        ...
+
+Pure helpers (next_cursor, encode_cursor, decode_cursor, top_queries_pipeline)
+do no I/O and are used directly from their modules.
+'''
+
+import asyncio
+import functools
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import settings
+import mysql_connector
+import log_stats
+import log_writer
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_DB_WORKERS, thread_name_prefix='async-db'
+            )
+        return _executor
+
+
+def to_async(func):
+    '''
+    Wraps a blocking function into a coroutine function with the same signature
+    that runs it on the async_db thread pool.
+    '''
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+    return wrapper
+
+
+async def stream_search(conn, query_type, params, columns=mysql_connector.EXPORT_COLUMNS,
+                        batch_size=1000):
+    '''
+    Async iterator over mysql_connector.stream_search with the same arguments.
+    Each batch of batch_size rows is pulled from the generator on the thread pool;
+    the generator (and its cursor) is closed when iteration ends or stops early.
+    '''
+
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    films = mysql_connector.stream_search(conn, query_type, params, columns, batch_size)
+    try:
+        while True:
+            batch = await loop.run_in_executor(executor, list, itertools.islice(films, batch_size))
+            if not batch:
+                return
+            for film in batch:
+                yield film
+    finally:
+        await loop.run_in_executor(executor, films.close)
+
+
+def shutdown(wait: bool = True) -> None:
+    '''Stops the async_db thread pool; it is recreated on the next call.'''
+
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+# mysql_connector
+get_film_titles = to_async(mysql_connector.get_film_titles)
+get_films_by_ids = to_async(mysql_connector.get_films_by_ids)
+get_film_details = to_async(mysql_connector.get_film_details)
+search_by_keyword = to_async(mysql_connector.search_by_keyword)
+get_genres_and_year_range = to_async(mysql_connector.get_genres_and_year_range)
+search_by_genre_and_years = to_async(mysql_connector.search_by_genre_and_years)
+search_by_actor_name_partial = to_async(mysql_connector.search_by_actor_name_partial)
+search_by_actor_name = to_async(mysql_connector.search_by_actor_name)
+get_length_range = to_async(mysql_connector.get_length_range)
+get_catalog_metadata = to_async(mysql_connector.get_catalog_metadata)
+get_refresh_watermark = to_async(mysql_connector.get_refresh_watermark)
+select_film_source = to_async(mysql_connector.select_film_source)
+search_combined = to_async(mysql_connector.search_combined)
+faceted_search = to_async(mysql_connector.faceted_search)
+search_by_length_range = to_async(mysql_connector.search_by_length_range)
+run_search = to_async(mysql_connector.run_search)
+
+# log_stats
+get_top_queries = to_async(log_stats.get_top_queries)
+get_popular_searches = to_async(log_stats.get_popular_searches)
+get_last_queries = to_async(log_stats.get_last_queries)
+get_queries_by_type = to_async(log_stats.get_queries_by_type)
+get_query_rates = to_async(log_stats.get_query_rates)
+get_query_counts = to_async(log_stats.get_query_counts)
+handle_query_count = to_async(log_stats.handle_query_count)
+
+# log_writer
+log_query = to_async(log_writer.log_query)
+flush_logs = to_async(log_writer.flush)
@@ -0,0 +1,193 @@
+'''
+Batch (non-interactive) film search runner.
+
+Reads query specs as JSONL from a file or stdin, one search per line:
+    {"id": "q1", "query_type": "keyword", "params": {"keyword": "love"}, "pages": 2}
+    {"query_type": "genre_year", "params": {"genre": "Comedy", "year_from": 2005, "year_to": 2006}}
+Optional keys: "id" (echoed back), "after" (cursor token to start from),
+"limit" (page size) and "pages" (number of pages to fetch, default 1).
+
+Specs run concurrently on a bounded thread pool backed by a MySQL connection pool,
+and one JSONL result per spec is streamed to stdout or a file, in input order or
+in completion order. Each search is logged through the buffered log writer, and a
+throughput report is printed to stderr at the end.
+
+Usage:
+    python batch_search.py queries.jsonl -o results.jsonl --workers 8 --order completion
+'''
+
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import settings
+import mysql_connector
+import log_writer
+import slow_query_log
+
+
+def run_spec(pool, index: int, spec: dict, log: bool = True) -> dict:
+    '''
+    Executes one query spec and builds its output record.
+    Args:
+        pool (settings.MySQLPool): Connection pool.
+        index (int): Zero-based line number of the spec in the input.
+        spec (dict): Parsed query spec.
+        log (bool): Write a query log entry per page fetched.
+    Returns:
+        dict: Output record with the films, the next cursor and timing, or an 'error'.
+    '''
+
+    started = time.perf_counter()
+    record = {'index': index, 'id': spec.get('id'), 'query_type': spec.get('query_type')}
+    try:
+        query_type = spec['query_type']
+        params = spec.get('params') or {}
+        limit = int(spec.get('limit', mysql_connector.PAGE_SIZE))
+        after = tuple(spec['after']) if spec.get('after') else None
+        if query_type not in mysql_connector.SORT_KEYS:
+            raise ValueError(f'Unknown query type: {query_type}')
+        sort_key = mysql_connector.SORT_KEYS[query_type]
+
+        films, pages = [], 0
+        for _ in range(max(1, int(spec.get('pages', 1)))):
+            page = mysql_connector.run_search(pool, query_type, params, after, limit)
+            pages += 1
+            if log:
+                log_writer.log_query(query_type, params)
+            films.extend(page)
+            after = mysql_connector.next_cursor(page, sort_key) if len(page) >= limit else None
+            if after is None:
+                break
+
+        record.update(params=params, pages=pages, results=films, next_cursor=after)
+    except Exception as e:
+        record['error'] = f'{type(e).__name__}: {e}'
+
+    record['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return record
+
+
+def read_specs(stream):
+    '''
+    Yields (index, spec) pairs from a JSONL stream, skipping blank lines.
+    Lines that are not a JSON object yield a {'_parse_error': ...} spec.
+    '''
+
+    for index, line in enumerate(stream):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            spec = json.loads(line)
+        except json.JSONDecodeError as e:
+            spec = {'_parse_error': str(e)}
+        if not isinstance(spec, dict):
+            spec = {'_parse_error': f'expected an object, got {type(spec).__name__}'}
+        yield index, spec
+
+
+def run_batch(specs, out, pool, workers: int = 4, order: str = 'input', log: bool = True) -> dict:
+    '''
+    Runs query specs concurrently and streams one JSON line per spec to `out`.
+    At most 2 * workers specs are in flight, so memory stays bounded for any input size.
+    Args:
+        specs (iterable): (index, spec) pairs, e.g. from read_specs.
+        out: Text stream for the JSONL results.
+        pool (settings.MySQLPool): Connection pool shared by the workers.
+        workers (int): Number of worker threads.
+        order (str): 'input' keeps the input order, 'completion' writes results as they finish.
+        log (bool): Write query log entries.
+    Returns:
+        dict: Throughput report.
+    '''
+
+    stats = {'queries': 0, 'errors': 0, 'pages': 0, 'films': 0}
+    started = time.perf_counter()
+
+    def submit(executor, index, spec):
+        if '_parse_error' in spec:
+            return executor.submit(lambda: {'index': index, 'error': f'Invalid JSON: {spec["_parse_error"]}'})
+        return executor.submit(run_spec, pool, index, spec, log)
+
+    def emit(record):
+        stats['queries'] += 1
+        if 'error' in record:
+            stats['errors'] += 1
+        else:
+            stats['pages'] += record['pages']
+            stats['films'] += len(record['results'])
+        out.write(json.dumps(record, default=str, ensure_ascii=False) + '\n')
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-search') as executor:
+        pending = deque()
+        for index, spec in specs:
+            pending.append(submit(executor, index, spec))
+            while len(pending) >= 2 * workers:
+                if order == 'input':
+                    emit(pending.popleft().result())
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.remove(future)
+                        emit(future.result())
+
+        if order == 'input':
+            while pending:
+                emit(pending.popleft().result())
+        else:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    emit(future.result())
+
+    elapsed = time.perf_counter() - started
+    stats['elapsed_s'] = round(elapsed, 3)
+    stats['queries_per_s'] = round(stats['queries'] / elapsed, 1) if elapsed else 0.0
+    stats['films_per_s'] = round(stats['films'] / elapsed, 1) if elapsed else 0.0
+    return stats
+
+
+def main() -> None:
+    '''Command-line entry point of the batch search runner.'''
+
+    parser = argparse.ArgumentParser(description='Run film searches from a JSONL file.')
+    parser.add_argument('input', nargs='?', default='-', help='JSONL query specs (default: stdin)')
+    parser.add_argument('-o', '--output', default='-', help='JSONL results (default: stdout)')
+    parser.add_argument('--workers', type=int, default=4, help='concurrent searches')
+    parser.add_argument('--order', choices=['input', 'completion'], default='input',
+                        help='write results in input order or as they complete')
+    parser.add_argument('--no-log', action='store_true', help='do not write query logs to MongoDB')
+    args = parser.parse_args()
+
+    pool = settings.create_mysql_pool(max_size=args.workers)
+    warning = mysql_connector.select_film_source(pool)
+    if warning:
+        print(warning, file=sys.stderr)
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        report = run_batch(read_specs(source), out, pool, args.workers, args.order, not args.no_log)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+        pool.close()
+        log_writer.shutdown()
+        slow_query_log.shutdown(timeout=2)
+        settings.close_mysql_pool()
+
+    print(
+        f"{report['queries']} queries ({report['errors']} failed), {report['pages']} pages, "
+        f"{report['films']} films in {report['elapsed_s']} s: "
+        f"{report['queries_per_s']} queries/s, {report['films_per_s']} films/s",
+        file=sys.stderr
+    )
+
+
+if __name__ == '__main__':
+    main()
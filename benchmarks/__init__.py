@@ -0,0 +1,4 @@
+'''
+Benchmarks for the search and statistics functions.
+Run the modules from the repository root, e.g. python -m benchmarks.top_queries.
+'''
@@ -0,0 +1,220 @@
+'''
+Benchmark suite for the search and statistics functions across data scales.
+
+For every scale factor the synthetic catalog (benchmarks.synthetic_data) is loaded
+into a SQLite file or a scratch MySQL database, and every search is timed on the
+first page and on deeper pages (walking the keyset pages before it untimed), next
+to the partial actor search, the faceted search, the catalog metadata queries
+and get_film_details. The result cache is bypassed, so every timing hits the
+database. With --logs, the log_stats functions are timed
+on a scratch Mongo collection filled with that many synthetic query logs.
+
+Results are written as JSON; --compare checks them against an earlier run and
+exits with status 1 when a timing regressed by more than --threshold.
+
+Usage:
+    python -m benchmarks.suite --scales 1 10 100 --pages 1 10 --output bench.json
+    python -m benchmarks.suite --scales 10 --compare bench.json --threshold 0.25
+    python -m benchmarks.suite --backend mysql --scales 10 --logs 1000000
+'''
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+import settings
+import mysql_connector
+import title_index
+from benchmarks.synthetic_data import SQLiteConnection, load_sql, iter_query_logs, load_mongo
+from benchmarks.top_queries import best_of
+
+SEARCHES = {
+    'keyword': {'keyword': 'love'},
+    'genre_year': {'genre': 'Action', 'year_from': 1995, 'year_to': 2005},
+    'actor_name': {'first_name': 'PEN', 'last_name': ''},
+    'length_range': {'min_length': 60, 'max_length': 120},
+    'combined': {'genre': 'Action', 'year_from': 1995, 'year_to': 2005,
+                 'min_length': 60, 'max_length': 120},
+}
+
+
+def _uncached(func):
+    '''Returns the undecorated function behind a result_cache.cached wrapper.'''
+
+    return getattr(func, '__wrapped__', func)
+
+
+def run_search(conn, query_type: str, params: dict, after=None):
+    '''Runs one page of a search without going through the result cache.'''
+
+    functions = {
+        'keyword': lambda: _uncached(mysql_connector.search_by_keyword)(
+            conn, params['keyword'], after),
+        'genre_year': lambda: _uncached(mysql_connector.search_by_genre_and_years)(
+            conn, params['genre'], params['year_from'], params['year_to'], after=after),
+        'actor_name': lambda: _uncached(mysql_connector.search_by_actor_name)(
+            conn, params['first_name'], params['last_name'], after=after),
+        'length_range': lambda: _uncached(mysql_connector.search_by_length_range)(
+            conn, params['min_length'], params['max_length'], after),
+        'combined': lambda: _uncached(mysql_connector.search_combined)(
+            conn, **params, after=after),
+    }
+    return functions[query_type]()
+
+
+def bench_catalog(conn, pages: list[int], repeat: int) -> dict:
+    '''Times every search at the given pages plus the metadata and detail queries.'''
+
+    timings = {}
+    for query_type, params in SEARCHES.items():
+        sort_key = mysql_connector.SORT_KEYS[query_type]
+        for page in pages:
+            after, rows = None, []
+            for _ in range(page - 1):
+                rows = run_search(conn, query_type, params, after)
+                after = mysql_connector.next_cursor(rows, sort_key)
+                if after is None:
+                    break
+            if page > 1 and after is None:
+                continue
+            seconds, rows = best_of(lambda: run_search(conn, query_type, params, after), repeat)
+            timings[f'search.{query_type}.page{page}'] = seconds * 1000
+
+    timings['get_catalog_metadata'] = best_of(
+        lambda: mysql_connector.get_catalog_metadata(conn), repeat)[0] * 1000
+    timings['get_length_range'] = best_of(
+        lambda: mysql_connector.get_length_range(conn), repeat)[0] * 1000
+    timings['search_by_actor_name_partial'] = best_of(
+        lambda: _uncached(mysql_connector.search_by_actor_name_partial)(conn, 'PEN'), repeat)[0] * 1000
+    timings['get_genres_and_year_range'] = best_of(
+        lambda: mysql_connector.get_genres_and_year_range(conn), repeat)[0] * 1000
+    timings['faceted_search'] = best_of(
+        lambda: mysql_connector.faceted_search(conn, SEARCHES['combined']), repeat)[0] * 1000
+    timings['get_film_details'] = best_of(
+        lambda: mysql_connector.get_film_details(conn, 1), repeat)[0] * 1000
+    return timings
+
+
+def bench_stats(log_count: int, repeat: int) -> dict:
+    '''
+    Times the log_stats functions on scratch collections filled with synthetic logs.
+    The collection settings are pointed at the scratch collections for the duration
+    of the run and restored afterwards; the scratch collections are dropped.
+    '''
+
+    import log_rollup
+    import log_stats
+
+    database = settings.get_mongo_client()[settings.MONGO_DB_NAME]
+    suffix = int(time.time())
+    saved = settings.MONGO_COLLECTION_NAME, settings.MONGO_ROLLUP_COLLECTION_NAME
+    settings.MONGO_COLLECTION_NAME = f'bench_logs_{suffix}'
+    settings.MONGO_ROLLUP_COLLECTION_NAME = f'bench_logs_{suffix}_rollup'
+    try:
+        load_mongo(settings.get_mongo_collection(), iter_query_logs(log_count))
+        log_rollup.rebuild()
+        week_ago = datetime.now(timezone.utc) - timedelta(days=7)
+        functions = {
+            'get_top_queries': lambda: log_stats.get_top_queries(),
+            'get_top_queries.since': lambda: log_stats.get_top_queries(since=week_ago),
+            'get_popular_searches': lambda: log_stats.get_popular_searches(),
+            'get_last_queries': lambda: log_stats.get_last_queries(),
+            'get_queries_by_type': lambda: log_stats.get_queries_by_type('keyword'),
+            'get_query_counts': lambda: log_stats.get_query_counts(),
+            'get_query_rates.hour': lambda: log_stats.get_query_rates('hour'),
+            'get_query_rates.day': lambda: log_stats.get_query_rates('day'),
+        }
+        return {name: best_of(func, repeat)[0] * 1000 for name, func in functions.items()}
+    finally:
+        database.drop_collection(settings.MONGO_COLLECTION_NAME)
+        database.drop_collection(settings.MONGO_ROLLUP_COLLECTION_NAME)
+        settings.MONGO_COLLECTION_NAME, settings.MONGO_ROLLUP_COLLECTION_NAME = saved
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    '''
+    Lists the timings that got slower than the baseline by more than `threshold`
+    (a fraction, 0.25 = 25%). Timings missing from either run are ignored.
+    '''
+
+    regressions = []
+    for section, timings in results['timings'].items():
+        for name, ms in timings.items():
+            before = baseline.get('timings', {}).get(section, {}).get(name)
+            if before and ms > before * (1 + threshold):
+                regressions.append(f'{section} {name}: {before:.2f} ms -> {ms:.2f} ms')
+    return regressions
+
+
+def main() -> None:
+    '''Command-line entry point of the benchmark suite.'''
+
+    parser = argparse.ArgumentParser(description='Benchmark searches and statistics across scales.')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10], help='scale factors')
+    parser.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite',
+                        help='sqlite (temporary file) or mysql (MYSQL_DATABASE, use a scratch database!)')
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 10], help='pages to time')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per timing (best is kept)')
+    parser.add_argument('--logs', type=int, default=0, help='synthetic query logs for the stats benchmark')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file from an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown (fraction)')
+    args = parser.parse_args()
+
+    results = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'backend': args.backend,
+        'python': platform.python_version(),
+        'repeat': args.repeat,
+        'timings': {},
+    }
+
+    if args.backend == 'sqlite':
+        # EXPLAIN FORMAT=JSON of slow statements would be sent to MySQL.
+        settings.SLOW_QUERY_ENABLED = False
+
+    for scale in args.scales:
+        if args.backend == 'sqlite':
+            path = os.path.join(tempfile.gettempdir(), f'bench_sakila_{scale}x.db')
+            conn = SQLiteConnection(path)
+        else:
+            conn = settings.create_mysql_connection()
+        try:
+            started = time.perf_counter()
+            counts = load_sql(conn, scale)
+            print(f'scale {scale}x: loaded {counts["film"]} films in {time.perf_counter() - started:.1f} s')
+            title_index.invalidate()
+            results['timings'][f'catalog.{scale}x'] = bench_catalog(conn, args.pages, args.repeat)
+        finally:
+            conn.close()
+            if args.backend == 'sqlite':
+                os.remove(path)
+
+    if args.logs:
+        results['timings'][f'stats.{args.logs}'] = bench_stats(args.logs, args.repeat)
+
+    for section, timings in results['timings'].items():
+        print(f'\n{section}')
+        for name, ms in timings.items():
+            print(f'  {name:<32} {ms:9.2f} ms')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print('\nRegressions:')
+            print('\n'.join(f'  {line}' for line in regressions))
+            sys.exit(1)
+        print('\nNo regressions.')
+
+
+if __name__ == '__main__':
+    main()
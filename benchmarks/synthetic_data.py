@@ -0,0 +1,362 @@
+'''
+Scalable synthetic Sakila-like data for benchmarks.
+
+Scale factor 1 matches the real Sakila sizes (1,000 films, 200 actors,
+16 categories); scale 10 to 1000 multiply films and actors. Films are generated
+as a deterministic stream (seeded), so even large scales are loaded in chunks
+without holding the whole catalog in memory.
+
+Loaders:
+    load_sql(conn, scale)          film, actor, category, film_actor, film_category
+                                   and the materialized film_extended table, into
+                                   SQLite (see SQLiteConnection) or a scratch MySQL
+                                   database (pymysql connection)
+    load_mongo(collection, docs)   synthetic query logs into a MongoDB collection
+    write_jsonl(path, docs)        query logs as JSONL (e.g. for mongoimport)
+
+Usage:
+    python -m benchmarks.synthetic_data --scale 10 --sqlite /tmp/sakila_10x.db
+'''
+
+import argparse
+import json
+import random
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from log_schema import POSSIBLE_KEYS
+
+BASE_FILMS = 1000
+BASE_ACTORS = 200
+CHUNK_SIZE = 5000
+
+CATEGORIES = [
+    'Action', 'Animation', 'Children', 'Classics', 'Comedy', 'Documentary', 'Drama', 'Family',
+    'Foreign', 'Games', 'Horror', 'Music', 'New', 'Sci-Fi', 'Sports', 'Travel',
+]
+RATINGS = ['G', 'PG', 'PG-13', 'R', 'NC-17']
+TITLE_WORDS = [
+    'ACADEMY', 'ACE', 'ADAPTATION', 'AFFAIR', 'AFRICAN', 'AGENT', 'AIRPLANE', 'ALADDIN', 'ALAMO',
+    'ALASKA', 'ALI', 'ALLEY', 'ALONE', 'AMADEUS', 'AMELIE', 'AMERICAN', 'ANACONDA', 'ANGELS',
+    'ANNIE', 'ANONYMOUS', 'ANTHEM', 'ANTITRUST', 'APACHE', 'APOCALYPSE', 'ARABIA', 'ARGONAUTS',
+    'ARMAGEDDON', 'ARSENIC', 'ARTIST', 'ATLANTIS', 'ATTACKS', 'BABY', 'BACKLASH', 'BADMAN',
+    'BALLOON', 'BANG', 'BASIC', 'BEACH', 'BEAR', 'BEAST', 'BEHAVIOR', 'BIRDS', 'BLADE', 'BLANKET',
+    'BLOOD', 'BRIDE', 'BUTTERFLY', 'CANDLES', 'CHAMBER', 'CHICKEN', 'CIRCUS', 'CLUE', 'COAST',
+    'CONFIDENTIAL', 'DANCING', 'DINOSAUR', 'DRAGON', 'DREAM', 'EGG', 'FANTASY', 'FIREBALL',
+    'GHOST', 'GOLDFINGER', 'HOLES', 'JUMANJI', 'LOVE', 'MATRIX', 'MOON', 'PREJUDICE', 'RIVER',
+    'STAR', 'SUNSET', 'TITANIC', 'WARS', 'WONDERLAND', 'ZORRO',
+]
+DESCRIPTION_WORDS = [
+    'Epic', 'Astounding', 'Fanciful', 'Fast-Paced', 'Thoughtful', 'Boring', 'Insightful',
+    'Drama', 'Documentary', 'Reflection', 'Saga', 'Story', 'Tale', 'Panorama', 'Yarn',
+    'Feminist', 'Database Administrator', 'Lumberjack', 'Pastry Chef', 'Dentist', 'Frisbee',
+    'Monkey', 'Crocodile', 'Mad Scientist', 'Astronaut', 'Boat', 'Car', 'Husband', 'Squirrel',
+]
+FIRST_NAMES = [
+    'PENELOPE', 'NICK', 'ED', 'JENNIFER', 'JOHNNY', 'BETTE', 'GRACE', 'MATTHEW', 'JOE',
+    'CHRISTIAN', 'ZERO', 'KARL', 'UMA', 'VIVIEN', 'CUBA', 'FRED', 'HELEN', 'DAN', 'BOB',
+    'LUCILLE', 'KIRSTEN', 'ELVIS', 'SANDRA', 'CAMERON', 'KEVIN', 'RIP', 'JULIA', 'WOODY',
+    'ALEC', 'SISSY', 'TIM', 'MILLA', 'AUDREY', 'JUDY', 'BURT', 'VAL', 'TOM', 'GOLDIE',
+]
+LAST_NAMES = [
+    'GUINESS', 'WAHLBERG', 'CHASE', 'DAVIS', 'LOLLOBRIGIDA', 'NICHOLSON', 'MOSTEL', 'JOHANSSON',
+    'SWANK', 'GABLE', 'CAGE', 'BERRY', 'WOOD', 'BERGEN', 'OLIVIER', 'COSTNER', 'VOIGHT',
+    'TORN', 'FAWCETT', 'TRACY', 'PALTROW', 'MARX', 'KILMER', 'STREEP', 'BLOOM', 'CRAWFORD',
+    'MCQUEEN', 'HOFFMAN', 'WAYNE', 'PECK', 'SOBIESKI', 'HACKMAN', 'WILLIAMS', 'DEGENERES',
+]
+
+SCHEMA = [
+    'CREATE TABLE category (category_id INTEGER PRIMARY KEY, name VARCHAR(25) NOT NULL, '
+    'last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP)',
+    'CREATE TABLE actor (actor_id INTEGER PRIMARY KEY, first_name VARCHAR(45) NOT NULL, '
+    'last_name VARCHAR(45) NOT NULL, last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP)',
+    'CREATE TABLE film (film_id INTEGER PRIMARY KEY, title VARCHAR(128) NOT NULL, '
+    'description TEXT, release_year INTEGER, rental_duration INTEGER NOT NULL, '
+    'rental_rate DECIMAL(4,2) NOT NULL, length INTEGER, rating VARCHAR(5), '
+    'last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP)',
+    'CREATE TABLE film_actor (actor_id INTEGER NOT NULL, film_id INTEGER NOT NULL, '
+    'last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (actor_id, film_id))',
+    'CREATE TABLE film_category (film_id INTEGER NOT NULL, category_id INTEGER NOT NULL, '
+    'last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (film_id, category_id))',
+    'CREATE TABLE film_extended (film_id INTEGER NOT NULL, title VARCHAR(128) NOT NULL, '
+    'description TEXT, release_year INTEGER, rental_duration INTEGER NOT NULL, '
+    'rental_rate DECIMAL(4,2) NOT NULL, length INTEGER, rating VARCHAR(5), '
+    'category VARCHAR(25) NOT NULL, actors TEXT, PRIMARY KEY (film_id, category))',
+    'CREATE INDEX idx_actor_first_name ON actor (first_name)',
+    'CREATE INDEX idx_actor_last_name ON actor (last_name)',
+    'CREATE INDEX idx_film_actor_film ON film_actor (film_id)',
+    'CREATE INDEX idx_film_extended_title ON film_extended (title, film_id)',
+    'CREATE INDEX idx_film_extended_category_year ON film_extended (category, release_year, film_id)',
+    'CREATE INDEX idx_film_extended_length ON film_extended (length, film_id)',
+]
+TABLES = ['film_extended', 'film_category', 'film_actor', 'film', 'actor', 'category']
+
+
+class SQLiteConnection:
+    '''
+    Minimal pymysql-style wrapper around sqlite3, so mysql_connector can run its
+    queries against a SQLite stand-in: %s placeholders and dict rows.
+    '''
+
+    def __init__(self, path: str = ':memory:'):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+
+    def cursor(self, cursorclass=None):
+        return _SQLiteCursor(self._conn.cursor())
+
+    def commit(self) -> None:
+        self._conn.commit()
+
+    def rollback(self) -> None:
+        self._conn.rollback()
+
+    def ping(self, reconnect: bool = True) -> None:
+        pass
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def _placeholders(query: str) -> str:
+    '''Turns pymysql's %s placeholders into SQLite's ? and %% back into %.'''
+
+    return query.replace('%s', '?').replace('%%', '%')
+
+
+class _SQLiteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    def execute(self, query: str, params=()):
+        self._cursor.execute(_placeholders(query), tuple(params or ()))
+
+    def executemany(self, query: str, rows):
+        self._cursor.executemany(_placeholders(query), rows)
+
+    def fetchall(self) -> list[dict]:
+        return [dict(row) for row in self._cursor.fetchall()]
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return dict(row) if row is not None else None
+
+    def fetchmany(self, size: int = 1) -> list[dict]:
+        return [dict(row) for row in self._cursor.fetchmany(size)]
+
+
+def actors(scale: int, seed: int = 42) -> list[tuple[int, str, str]]:
+    '''Returns (actor_id, first_name, last_name) for BASE_ACTORS * scale actors.'''
+
+    rng = random.Random(seed)
+    return [
+        (actor_id, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES))
+        for actor_id in range(1, BASE_ACTORS * scale + 1)
+    ]
+
+
+def iter_films(scale: int, seed: int = 42):
+    '''
+    Yields BASE_FILMS * scale synthetic films.
+    Each film is a dict with the film columns plus 'category_id' and 'actor_ids'.
+    '''
+
+    rng = random.Random(seed + 1)
+    actor_count = BASE_ACTORS * scale
+    combos = len(TITLE_WORDS) ** 2
+
+    for film_id in range(1, BASE_FILMS * scale + 1):
+        first, second = divmod((film_id - 1) % combos, len(TITLE_WORDS))
+        title = f'{TITLE_WORDS[first]} {TITLE_WORDS[second]}'
+        if film_id > combos:
+            title = f'{title} {(film_id - 1) // combos + 1}'
+        words = rng.sample(DESCRIPTION_WORDS, 4)
+        yield {
+            'film_id': film_id,
+            'title': title,
+            'description': (f'A {words[0]} {words[1]} of a {words[2]} '
+                            f'And a {words[3]} who must Chase a Monkey in Ancient China'),
+            'release_year': rng.randint(1990, 2006),
+            'rental_duration': rng.randint(3, 7),
+            'rental_rate': rng.choice([0.99, 2.99, 4.99]),
+            'length': rng.randint(46, 185),
+            'rating': rng.choice(RATINGS),
+            'category_id': rng.randint(1, len(CATEGORIES)),
+            'actor_ids': sorted(rng.sample(range(1, actor_count + 1), rng.randint(1, 10))),
+        }
+
+
+def _chunks(iterable, size: int):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def load_sql(conn, scale: int, seed: int = 42) -> dict:
+    '''
+    Creates the Sakila subset used by mysql_connector and fills it at the given scale.
+    Existing tables with the same names are dropped, so point it at a scratch
+    database. Works with SQLiteConnection and pymysql connections.
+    Returns:
+        dict: Row counts per table.
+    '''
+
+    actor_rows = actors(scale, seed)
+    names = {actor_id: f'{first} {last}' for actor_id, first, last in actor_rows}
+    counts = {'film': 0, 'film_actor': 0, 'actor': len(actor_rows), 'category': len(CATEGORIES)}
+
+    with conn.cursor() as cursor:
+        for table in TABLES:
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+        for statement in SCHEMA:
+            cursor.execute(statement)
+
+        cursor.executemany(
+            'INSERT INTO category (category_id, name) VALUES (%s, %s)',
+            list(enumerate(CATEGORIES, start=1))
+        )
+        cursor.executemany(
+            'INSERT INTO actor (actor_id, first_name, last_name) VALUES (%s, %s, %s)', actor_rows
+        )
+
+        for chunk in _chunks(iter_films(scale, seed), CHUNK_SIZE):
+            films, links, categories, extended = [], [], [], []
+            for film in chunk:
+                columns = (film['film_id'], film['title'], film['description'], film['release_year'],
+                           film['rental_duration'], film['rental_rate'], film['length'], film['rating'])
+                films.append(columns)
+                links.extend((actor_id, film['film_id']) for actor_id in film['actor_ids'])
+                categories.append((film['film_id'], film['category_id']))
+                extended.append(columns + (
+                    CATEGORIES[film['category_id'] - 1],
+                    ', '.join(names[actor_id] for actor_id in film['actor_ids']),
+                ))
+
+            cursor.executemany(
+                'INSERT INTO film (film_id, title, description, release_year, rental_duration, '
+                'rental_rate, length, rating) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)', films
+            )
+            cursor.executemany('INSERT INTO film_actor (actor_id, film_id) VALUES (%s, %s)', links)
+            cursor.executemany(
+                'INSERT INTO film_category (film_id, category_id) VALUES (%s, %s)', categories
+            )
+            cursor.executemany(
+                'INSERT INTO film_extended (film_id, title, description, release_year, '
+                'rental_duration, rental_rate, length, rating, category, actors) '
+                'VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)', extended
+            )
+            counts['film'] += len(films)
+            counts['film_actor'] += len(links)
+
+    conn.commit()
+    return counts
+
+
+def iter_query_logs(count: int, seed: int = 42, days: int = 30):
+    '''
+    Yields `count` synthetic query log documents in the log_writer format,
+    spread over the last `days` days. Popularity is skewed, like real traffic.
+    '''
+
+    rng = random.Random(seed + 2)
+    now = datetime.now(timezone.utc)
+    keywords = [word.lower() for word in TITLE_WORDS]
+
+    for _ in range(count):
+        query_type = rng.choice(['keyword', 'genre_year', 'actor_name', 'length_range'])
+        params = {key: None for key in POSSIBLE_KEYS}
+
+        if query_type == 'keyword':
+            params['keyword'] = keywords[min(int(rng.expovariate(0.2)), len(keywords) - 1)]
+        elif query_type == 'genre_year':
+            year_from = rng.randint(1990, 2006)
+            params.update(genre=rng.choice(CATEGORIES), year_from=year_from,
+                          year_to=rng.randint(year_from, 2006))
+        elif query_type == 'actor_name':
+            params['first_name'] = rng.choice(FIRST_NAMES)
+            params['last_name'] = rng.choice(LAST_NAMES[:5])
+        else:
+            min_length = rng.choice(range(46, 186, 10))
+            params.update(min_length=min_length, max_length=min(min_length + 30, 185))
+
+        yield {
+            'query_type': query_type,
+            'params': params,
+            'timestamp': now - timedelta(seconds=rng.randint(0, days * 86400)),
+        }
+
+
+def load_mongo(collection, docs) -> int:
+    '''Inserts query log documents into a MongoDB collection in batches; returns the count.'''
+
+    total = 0
+    for chunk in _chunks(docs, 10000):
+        collection.insert_many(chunk, ordered=False)
+        total += len(chunk)
+    return total
+
+
+def write_jsonl(path: str, docs) -> int:
+    '''Writes query log documents as MongoDB Extended JSON lines; returns the count.'''
+
+    total = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for doc in docs:
+            doc = dict(doc, timestamp={'$date': doc['timestamp'].isoformat()})
+            f.write(json.dumps(doc) + '\n')
+            total += 1
+    return total
+
+
+def main() -> None:
+    '''Command-line entry point of the generator.'''
+
+    parser = argparse.ArgumentParser(description='Generate synthetic Sakila data.')
+    parser.add_argument('--scale', type=int, default=10, help='scale factor (1 = Sakila size)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--sqlite', help='load the catalog into this SQLite file')
+    parser.add_argument('--mysql', action='store_true',
+                        help='load the catalog into MYSQL_DATABASE (use a scratch database!)')
+    parser.add_argument('--logs', type=int, default=0, help='number of query logs to generate')
+    parser.add_argument('--logs-jsonl', help='write the query logs to this JSONL file')
+    parser.add_argument('--logs-collection', help='insert the query logs into this Mongo collection')
+    args = parser.parse_args()
+
+    if args.sqlite:
+        conn = SQLiteConnection(args.sqlite)
+        print(f'SQLite {args.sqlite}: {load_sql(conn, args.scale, args.seed)}')
+        conn.close()
+
+    if args.mysql:
+        import settings
+        conn = settings.create_mysql_connection()
+        try:
+            print(f'MySQL {settings.DATABASE_MYSQL_NAME}: {load_sql(conn, args.scale, args.seed)}')
+        finally:
+            conn.close()
+
+    if args.logs and args.logs_jsonl:
+        print(f'{write_jsonl(args.logs_jsonl, iter_query_logs(args.logs, args.seed))} logs written')
+
+    if args.logs and args.logs_collection:
+        import settings
+        collection = settings.get_mongo_client()[settings.MONGO_DB_NAME][args.logs_collection]
+        print(f'{load_mongo(collection, iter_query_logs(args.logs, args.seed))} logs inserted')
+
+
+if __name__ == '__main__':
+    main()
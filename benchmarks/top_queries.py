@@ -0,0 +1,84 @@
+'''
+Benchmark of log_stats.get_top_queries: the server-side aggregation pipeline
+against the previous client-side implementation (find({}) + collections.Counter).
+
+The benchmark fills a scratch collection with synthetic query logs, times both
+implementations on it, checks that they agree and drops the collection.
+
+Usage:
+    python -m benchmarks.top_queries --docs 100000 --repeat 5
+'''
+
+import argparse
+import collections
+import time
+import settings
+import log_stats
+from log_schema import POSSIBLE_KEYS
+from benchmarks.synthetic_data import iter_query_logs, load_mongo
+
+
+def client_side_top_queries(collection, limit: int = 5) -> list[tuple[str, int]]:
+    '''
+    The original get_top_queries: scans every log and counts in Python.
+    '''
+
+    all_items = []
+    for doc in collection.find({}):
+        query_type = doc.get('query_type')
+        params = doc.get('params', {})
+        if not query_type or not isinstance(params, dict):
+            continue
+
+        for key in POSSIBLE_KEYS:
+            value = params.get(key)
+            if value is not None and value != '':
+                all_items.append(f"{query_type}.{key}:{value}".strip().lower())
+
+    return collections.Counter(all_items).most_common(limit)
+
+
+def best_of(func, repeat: int) -> tuple[float, object]:
+    '''Runs func `repeat` times and returns the best time in seconds and the last result.'''
+
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main() -> None:
+    '''Command-line entry point of the benchmark.'''
+
+    parser = argparse.ArgumentParser(description='Benchmark get_top_queries implementations.')
+    parser.add_argument('--docs', type=int, default=100000, help='number of synthetic logs')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per implementation')
+    parser.add_argument('--limit', type=int, default=5, help='top N')
+    args = parser.parse_args()
+
+    database = settings.get_mongo_collection().database
+    collection = database[f'bench_top_queries_{int(time.time())}']
+    try:
+        load_mongo(collection, iter_query_logs(args.docs))
+
+        client_time, client_top = best_of(
+            lambda: client_side_top_queries(collection, args.limit), args.repeat)
+        server_time, server_top = best_of(
+            lambda: [(d['_id'], d['count'])
+                     for d in collection.aggregate(log_stats.top_queries_pipeline(args.limit))],
+            args.repeat)
+    finally:
+        collection.drop()
+
+    print(f'documents: {args.docs}, best of {args.repeat} runs')
+    print(f'client-side find + Counter: {client_time * 1000:.1f} ms')
+    print(f'server-side aggregation:    {server_time * 1000:.1f} ms')
+    print(f'speed-up: {client_time / server_time:.1f}x')
+    if sorted(c for _, c in client_top) != sorted(c for _, c in server_top):
+        print('WARNING: implementations returned different counts')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+'''
+The cache_warmup module pre-executes the most popular logged searches so their
+first result page is already in the result cache (see result_cache) when a user
+asks for it.
+
+Popular searches come from the MongoDB query log (log_stats.get_popular_searches).
+The warm-up stops when it runs out of its time budget or has added more than its
+memory budget to the cache. It runs once at start-up or periodically, on a
+background thread; pass it a settings.MySQLPool so it never shares a connection
+with the interactive session.
+'''
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import settings
+import mysql_connector
+import result_cache
+import errors
+
+_stop = threading.Event()
+_thread = None
+
+
+def warm_up(conn, max_queries: int = settings.WARMUP_MAX_QUERIES,
+            time_budget: float = settings.WARMUP_TIME_BUDGET,
+            memory_budget: int = settings.WARMUP_MEMORY_BUDGET,
+            lookback_days: float = settings.WARMUP_LOOKBACK_DAYS) -> dict:
+    '''
+    Loads the first page of the most popular searches into the result cache.
+    Args:
+        conn: MySQL connection or settings.MySQLPool.
+        max_queries (int): Maximum number of searches to pre-execute.
+        time_budget (float): Seconds after which no further search is started.
+        memory_budget (int): Approximate bytes the warm-up may add to the cache.
+        lookback_days (float): Only consider searches logged in this many recent days
+                               (0 for the whole history).
+    Returns:
+        dict: Counts of executed, failed and skipped searches and the elapsed time.
+    '''
+
+    started = time.monotonic()
+    report = {'executed': 0, 'failed': 0, 'skipped': 0, 'elapsed_s': 0.0}
+    if not settings.RESULT_CACHE_ENABLED:
+        return report
+
+    import log_stats
+    since = None
+    if lookback_days:
+        since = datetime.now(timezone.utc) - timedelta(days=lookback_days)
+    popular = log_stats.get_popular_searches(max_queries, since=since)
+
+    cache = result_cache.get_cache()
+    start_bytes = cache.stats()['approx_bytes']
+
+    for search in popular:
+        out_of_time = time.monotonic() - started > time_budget
+        out_of_memory = cache.stats()['approx_bytes'] - start_bytes > memory_budget
+        if out_of_time or out_of_memory or _stop.is_set():
+            report['skipped'] += 1
+            continue
+        try:
+            mysql_connector.run_search(conn, search['query_type'], search['params'])
+            report['executed'] += 1
+        except Exception as e:
+            report['failed'] += 1
+            errors.log_error_to_file(f'Cache warm-up of {search["query_type"]} failed: {e}')
+
+    report['elapsed_s'] = round(time.monotonic() - started, 3)
+    return report
+
+
+def _run(conn, interval: float) -> None:
+    while not _stop.is_set():
+        try:
+            warm_up(conn)
+        except Exception as e:
+            errors.log_error_to_file(f'Cache warm-up failed: {e}')
+        if not interval or _stop.wait(interval):
+            return
+
+
+def start_background(conn, interval: float = settings.WARMUP_INTERVAL) -> threading.Thread:
+    '''
+    Starts the warm-up on a daemon thread.
+    Args:
+        conn: settings.MySQLPool (a plain connection must not be shared across threads).
+        interval (float): Repeat every `interval` seconds; 0 runs the warm-up once.
+    Returns:
+        threading.Thread: The started thread.
+    '''
+
+    global _thread
+    _stop.clear()
+    _thread = threading.Thread(target=_run, args=(conn, interval), name='cache-warmup', daemon=True)
+    _thread.start()
+    return _thread
+
+
+def stop(timeout: float = 1.0) -> None:
+    '''Asks the background warm-up to stop and waits briefly for it.'''
+
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout)
@@ -0,0 +1,62 @@
+'''
+The catalog_cache module keeps the film catalog metadata shown by the search menus
+(genres, release year range, length range) in memory.
+
+All values are loaded together with a single query (mysql_connector.get_catalog_metadata)
+and reused until settings.CATALOG_CACHE_TTL seconds have passed or invalidate() is
+called, e.g. after refreshing film_extended.
+'''
+
+import threading
+import time
+import mysql_connector
+import settings
+
+_lock = threading.Lock()
+_metadata = None
+_loaded_at = 0.0
+
+
+def get_metadata(conn) -> dict:
+    '''
+    Returns the cached catalog metadata, loading it if missing or expired.
+    Args:
+        conn: MySQL connection used only when the cache has to be (re)loaded.
+    Returns:
+        dict: Keys 'genres', 'min_year', 'max_year', 'min_length', 'max_length'.
+    '''
+
+    global _metadata, _loaded_at
+    with _lock:
+        if _metadata is None or time.monotonic() - _loaded_at > settings.CATALOG_CACHE_TTL:
+            _metadata = mysql_connector.get_catalog_metadata(conn)
+            _loaded_at = time.monotonic()
+        return _metadata
+
+
+def get_genres_and_year_range(conn):
+    '''
+    Cached counterpart of mysql_connector.get_genres_and_year_range.
+    return: List of genres, minimum year, maximum year.
+    '''
+
+    metadata = get_metadata(conn)
+    return list(metadata['genres']), metadata['min_year'], metadata['max_year']
+
+
+def get_length_range(conn):
+    '''
+    Cached counterpart of mysql_connector.get_length_range.
+    return: Minimum length, maximum length in minutes.
+    '''
+
+    metadata = get_metadata(conn)
+    return metadata['min_length'], metadata['max_length']
+
+
+def invalidate() -> None:
+    '''Drops the cached metadata so the next call reloads it.'''
+
+    global _metadata
+    with _lock:
+        _metadata = None
@@ -0,0 +1,99 @@
+'''
+The catalog_watch module lets a running process notice refreshes of film_extended
+made by another process (refresh_film_extended.py is a separate command).
+
+A daemon thread reads the refresh watermark (film_extended_refresh.refreshed_until)
+every settings.CATALOG_WATCH_INTERVAL seconds. When it has moved since the last
+check, the search result cache, the catalog metadata cache and the title index
+are invalidated, so the next searches read the refreshed table. While searches
+fall back to film_extended_view (see mysql_connector.select_film_source), the
+first refresh switches them back to film_extended.
+'''
+
+import threading
+import settings
+import mysql_connector
+import catalog_cache
+import title_index
+import result_cache
+import errors
+
+_UNSET = object()
+
+_stop = threading.Event()
+_thread = None
+_lock = threading.Lock()
+_watermark = _UNSET
+
+
+def invalidate_all() -> None:
+    '''Drops every in-process cache derived from film_extended.'''
+
+    catalog_cache.invalidate()
+    title_index.invalidate()
+    result_cache.invalidate()
+
+
+def check(conn) -> bool:
+    '''
+    Reads the refresh watermark and invalidates the caches if it moved.
+    The first check only records the watermark.
+    Args:
+        conn: MySQL connection or settings.MySQLPool.
+    Returns:
+        bool: True if a refresh was detected.
+    '''
+
+    global _watermark
+    switched = False
+    if mysql_connector.using_fallback_source():
+        mysql_connector.select_film_source(conn)
+        if mysql_connector.using_fallback_source():
+            return False
+        switched = True
+    watermark = mysql_connector.get_refresh_watermark(conn)
+    with _lock:
+        changed = switched or (_watermark is not _UNSET and watermark != _watermark)
+        _watermark = watermark
+    if changed:
+        invalidate_all()
+    return changed
+
+
+def _run(conn, interval: float) -> None:
+    while not _stop.is_set():
+        try:
+            check(conn)
+        except Exception as e:
+            errors.log_error_to_file(f'Catalog refresh check failed: {e}')
+        if _stop.wait(interval):
+            return
+
+
+def start_background(conn, interval: float = settings.CATALOG_WATCH_INTERVAL):
+    '''
+    Starts watching the refresh watermark on a daemon thread.
+    Does nothing when interval is 0 or the searches are not meant to read film_extended.
+    Args:
+        conn: settings.MySQLPool (a plain connection must not be shared across threads).
+        interval (float): Seconds between two checks.
+    Returns:
+        threading.Thread: The started thread, or None.
+    '''
+
+    global _thread
+    if not interval or (settings.FILM_SOURCE != 'film_extended'
+                        and not mysql_connector.using_fallback_source()):
+        return None
+    _stop.clear()
+    _thread = threading.Thread(target=_run, args=(conn, interval), name='catalog-watch', daemon=True)
+    _thread.start()
+    return _thread
+
+
+def stop(timeout: float = 1.0) -> None:
+    '''Stops the background watcher.'''
+
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout)
@@ -0,0 +1,9 @@
+'''
+Index used by the actor search path (mysql_connector.search_by_actor_name).
+Sakila already indexes actor(last_name) as idx_actor_last_name; this adds the
+first name, so both prefix lookups are index range scans. film_actor is reached
+through its primary key (actor_id, film_id).
+'''
+
+use sakila;
+CREATE INDEX idx_actor_first_name ON actor (first_name);
@@ -0,0 +1,32 @@
+'''
+Materialized copy of film_extended_view.
+The view re-runs a five-table JOIN with GROUP BY and GROUP_CONCAT on every query,
+so no index on title, length or release_year can help a search. film_extended stores
+the same rows in a real table with indexes matching the search orderings
+(sort column, film_id). It is filled and kept up to date by refresh_film_extended.py,
+which rebuilds only the films whose rows changed since the last refresh.
+'''
+
+use sakila;
+CREATE TABLE IF NOT EXISTS film_extended (
+    film_id SMALLINT UNSIGNED NOT NULL,
+    title VARCHAR(128) NOT NULL,
+    description TEXT,
+    release_year YEAR,
+    rental_duration TINYINT UNSIGNED NOT NULL,
+    rental_rate DECIMAL(4,2) NOT NULL,
+    length SMALLINT UNSIGNED,
+    rating ENUM('G','PG','PG-13','R','NC-17') DEFAULT 'G',
+    category VARCHAR(25) NOT NULL,
+    actors TEXT,
+    refreshed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (film_id, category),
+    KEY idx_film_extended_title (title, film_id),
+    KEY idx_film_extended_category_year (category, release_year, film_id),
+    KEY idx_film_extended_length (length, film_id)
+);
+
+CREATE TABLE IF NOT EXISTS film_extended_refresh (
+    id TINYINT UNSIGNED NOT NULL PRIMARY KEY,
+    refreshed_until TIMESTAMP NOT NULL
+);
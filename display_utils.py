@@ -1,10 +1,9 @@
 '''
 Module display_utils provides functions to format and print various tables
 related to queries and films, using ANSI color codes for terminal output.
+tabulate is imported on first use to keep program start-up fast.
 '''
 
-import tabulate
-
 def display_query_counts_table(query_counts: dict) -> None:
     '''
     Prints a formatted table showing counts per query type.
@@ -16,6 +15,7 @@ def display_query_counts_table(query_counts: dict) -> None:
 
     data = [[q_type, count] for q_type, count in query_counts.items()]
     headers = ['Query Type', 'Count']
+    import tabulate
     print(tabulate.tabulate(data, headers=headers, tablefmt='grid'))
 
 
@@ -45,7 +45,8 @@ def display_queries_table(queries: list[dict]) -> None:
     Only non-empty parameters for each query are shown.
     Args:
         queries (list of dict): List of query entries. Each entry should have keys
-                                like '_id', 'query_type', 'timestamp', and 'params'.
+                                like '_id', 'query_type', 'timestamp', and 'params',
+                                and may have a 'count' of uses.
     Returns:
         None
     '''
@@ -54,6 +55,7 @@ def display_queries_table(queries: list[dict]) -> None:
         print('\nNo queries found.')
         return
 
+    with_counts = all('count' in entry for entry in queries)
     table = []
     for entry in queries:
         filtered_params = {i: j for i, j in entry.get('params', {}).items() if j not in (None, '')}
@@ -65,9 +67,14 @@ def display_queries_table(queries: list[dict]) -> None:
             entry.get('timestamp').strftime('%Y-%m-%d %H:%M:%S') if entry.get('timestamp') else '',
             params_str
         ]
+        if with_counts:
+            row.append(entry['count'])
         table.append(row)
 
     headers = ['ID', 'Query Type', 'Timestamp', 'Parameters']
+    if with_counts:
+        headers.append('Uses')
+    import tabulate
     print(tabulate.tabulate(table, headers=headers, tablefmt='grid'))
 
 
@@ -98,9 +105,35 @@ def display_top_parameters(top_params: list[tuple[str, int]]) -> None:
         table.append(row)
 
     headers = ['Query Type', 'Parameter', 'Value', 'Count']
+    import tabulate
     print(tabulate.tabulate(table, headers=headers, tablefmt='grid'))
 
 
+def display_query_rates(rates: list[dict], unit: str) -> None:
+    '''
+    Prints a table of query counts per time bucket and query type.
+    Args:
+        rates (list of dict): Rows with 'bucket', 'query_type' and 'count',
+                              as returned by log_stats.get_query_rates.
+        unit (str): Bucket size ('minute', 'hour' or 'day').
+    Returns:
+        None
+    '''
+
+    if not rates:
+        print('\nNo data to display.')
+        return
+
+    formats = {'minute': '%Y-%m-%d %H:%M', 'hour': '%Y-%m-%d %H:00', 'day': '%Y-%m-%d'}
+    table = [
+        [row['bucket'].strftime(formats.get(unit, '%Y-%m-%d %H:%M')), row['query_type'], row['count']]
+        for row in rates
+    ]
+    import tabulate
+    print(tabulate.tabulate(table, headers=['Period (UTC)', 'Query Type', f'Queries / {unit}'],
+                            tablefmt='grid'))
+
+
 def display_films_table(films: list[dict]) -> None:
     '''
     Displays a formatted table of films.
@@ -129,4 +162,80 @@ def display_films_table(films: list[dict]) -> None:
         table.append(row)
 
     headers = ['ID', 'Title', 'Description', 'Year', 'Length', 'Rating']
+    import tabulate
     print(tabulate.tabulate(table, headers=headers, tablefmt='grid'))
+
+
+def display_facets(total: int, facets: dict, bucket_widths: dict = None) -> None:
+    '''
+    Displays the number of matching films and their breakdown per facet.
+    Args:
+        total (int): Number of matching films.
+        facets (dict): Facet name -> list of (value, count), as returned by
+                       mysql_connector.faceted_search.
+        bucket_widths (dict, optional): Facet name -> bucket width, for facets whose
+                                        values are the lower bounds of numeric buckets.
+    Returns:
+        None
+    '''
+
+    print(colorize(f'\n{total} films found.', 'yellow'))
+    if not total:
+        return
+
+    import tabulate
+    labels = {'genre': 'Genre', 'rating': 'Rating', 'year': 'Years', 'length': 'Length (min)'}
+    widths = bucket_widths or {}
+    for kind, values in facets.items():
+        if kind in widths:
+            values = [(f'{value}-{value + widths[kind] - 1}', count) for value, count in values]
+        print(f'\n{colorize(labels.get(kind, kind), "blue")}')
+        print(tabulate.tabulate(values, headers=['Value', 'Films'], tablefmt='grid'))
+
+
+def display_film_details(film: dict) -> None:
+    '''
+    Displays every field of a single film, with the full description and actors.
+    Args:
+        film (dict): Film record as returned by mysql_connector.get_film_details.
+    Returns:
+        None
+    '''
+
+    if not film:
+        print('\nFilm not found.')
+        return
+
+    import tabulate
+    fields = [
+        ('ID', 'film_id'),
+        ('Title', 'title'),
+        ('Year', 'release_year'),
+        ('Category', 'category'),
+        ('Rating', 'rating'),
+        ('Length', 'length'),
+        ('Rental duration', 'rental_duration'),
+        ('Rental rate', 'rental_rate'),
+        ('Description', 'description'),
+        ('Actors', 'actors'),
+    ]
+    table = [[label, film.get(key, '')] for label, key in fields]
+    print(tabulate.tabulate(table, tablefmt='grid', maxcolwidths=[None, 70]))
+
+
+def display_stats_table(stats: dict) -> None:
+    '''
+    Displays a two-column table of named metrics.
+    Args:
+        stats (dict): Mapping of metric names to values.
+    Returns:
+        None
+    '''
+
+    if not stats:
+        print('\nNo data to display.')
+        return
+
+    import tabulate
+    table = [[name, value] for name, value in stats.items()]
+    print(tabulate.tabulate(table, headers=['Metric', 'Value'], tablefmt='grid'))
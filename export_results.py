@@ -0,0 +1,169 @@
+'''
+Export of complete search results to CSV or JSONL.
+
+Every film matching a search is streamed from MySQL through an unbuffered
+server-side cursor (see mysql_connector.stream_search) and written as soon as it
+arrives, so memory use stays flat however many films match.
+
+Usage:
+    python export_results.py keyword --keyword love -o love.csv
+    python export_results.py genre_year --genre Comedy --year-from 2000 --year-to 2006 --format jsonl
+    python export_results.py actor_name --first-name PEN -o - > penelope.jsonl
+    python export_results.py length_range --min-length 60 --max-length 90 -o short.csv
+    python export_results.py combined --genre Action --rating PG --year-from 2000 -o action.csv
+'''
+
+import argparse
+import csv
+import json
+import sys
+import time
+from contextlib import closing
+import settings
+import mysql_connector
+import log_writer
+import slow_query_log
+
+
+def write_csv(films, out, columns: tuple) -> int:
+    '''Writes films as CSV with a header row; returns the number of films.'''
+
+    writer = csv.DictWriter(out, fieldnames=[column_name(c) for c in columns])
+    writer.writeheader()
+    count = 0
+    for film in films:
+        writer.writerow(film)
+        count += 1
+    return count
+
+
+def write_jsonl(films, out, columns: tuple = None) -> int:
+    '''Writes films as JSON lines; returns the number of films.'''
+
+    count = 0
+    for film in films:
+        out.write(json.dumps(film, default=str, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl}
+
+
+def column_name(expression: str) -> str:
+    '''Returns the result column name of a select expression ('x AS y' -> 'y').'''
+
+    return expression.rsplit(' AS ', 1)[-1].strip()
+
+
+def export_search(conn, query_type: str, params: dict, out, fmt: str = 'csv',
+                  columns: tuple = mysql_connector.EXPORT_COLUMNS) -> int:
+    '''
+    Streams every film matching a search into an open text file.
+    Args:
+        conn: MySQL connection or settings.MySQLPool; it is busy until the export ends.
+        query_type (str): 'keyword', 'genre_year', 'actor_name', 'length_range' or 'combined'.
+        params (dict): Query parameters as written by log_writer.log_query.
+        out: Writable text file.
+        fmt (str): 'csv' or 'jsonl'.
+        columns (tuple): Column projection.
+    Returns:
+        int: Number of films written.
+    '''
+
+    # Closing the generator releases its cursor (and pooled connection) even
+    # when writing stops early.
+    with closing(mysql_connector.stream_search(conn, query_type, params, columns)) as films:
+        return WRITERS[fmt](films, out, columns)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    '''Builds the command line: one sub-command per search type.'''
+
+    parser = argparse.ArgumentParser(description='Export all films matching a search.')
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-o', '--output', default='-', help='output file, - for stdout')
+    common.add_argument('--format', choices=sorted(WRITERS),
+                        help='output format (default: from the file extension, else csv)')
+    common.add_argument('--no-log', action='store_true', help='do not write a query log entry')
+
+    searches = parser.add_subparsers(dest='query_type', required=True)
+    keyword = searches.add_parser('keyword', parents=[common], help='films whose title contains a keyword')
+    keyword.add_argument('--keyword', required=True)
+
+    genre_year = searches.add_parser('genre_year', parents=[common], help='films of a genre and year range')
+    genre_year.add_argument('--genre', required=True)
+    genre_year.add_argument('--year-from', type=int, required=True)
+    genre_year.add_argument('--year-to', type=int)
+
+    actor_name = searches.add_parser('actor_name', parents=[common], help='films by actor name prefixes')
+    actor_name.add_argument('--first-name', default='')
+    actor_name.add_argument('--last-name', default='')
+
+    length_range = searches.add_parser('length_range', parents=[common], help='films by length range')
+    length_range.add_argument('--min-length', type=int, required=True)
+    length_range.add_argument('--max-length', type=int)
+
+    combined = searches.add_parser('combined', parents=[common],
+                                   help='films matching every given filter')
+    combined.add_argument('--keyword')
+    combined.add_argument('--genre')
+    combined.add_argument('--rating')
+    combined.add_argument('--year-from', type=int)
+    combined.add_argument('--year-to', type=int)
+    combined.add_argument('--min-length', type=int)
+    combined.add_argument('--max-length', type=int)
+    combined.add_argument('--first-name')
+    combined.add_argument('--last-name')
+
+    return parser.parse_args(argv)
+
+
+def search_params(args: argparse.Namespace) -> dict:
+    '''Turns parsed arguments into query parameters in the query log format.'''
+
+    if args.query_type == 'keyword':
+        return {'keyword': args.keyword}
+    if args.query_type == 'genre_year':
+        return {'genre': args.genre, 'year_from': args.year_from,
+                'year_to': args.year_to if args.year_to is not None else args.year_from}
+    if args.query_type == 'actor_name':
+        return {'first_name': args.first_name, 'last_name': args.last_name}
+    if args.query_type == 'combined':
+        return {name: getattr(args, name) for name in mysql_connector.COMBINED_FILTERS}
+    return {'min_length': args.min_length,
+            'max_length': args.max_length if args.max_length is not None else args.min_length}
+
+
+def main(argv=None) -> None:
+    '''Command-line entry point of the export.'''
+
+    args = parse_args(argv)
+    params = search_params(args)
+    fmt = args.format or ('jsonl' if args.output.endswith(('.jsonl', '.json')) else 'csv')
+
+    conn = settings.create_mysql_connection()
+    warning = mysql_connector.select_film_source(conn)
+    if warning:
+        print(warning, file=sys.stderr)
+    started = time.perf_counter()
+    try:
+        if args.output == '-':
+            count = export_search(conn, args.query_type, params, sys.stdout, fmt)
+        else:
+            with open(args.output, 'w', encoding='utf-8', newline='') as out:
+                count = export_search(conn, args.query_type, params, out, fmt)
+        if not args.no_log:
+            log_writer.log_query(args.query_type, params)
+    finally:
+        conn.close()
+        log_writer.shutdown()
+        slow_query_log.shutdown(timeout=2)
+        settings.close_mysql_pool()
+        settings.close_mongo_client()
+
+    print(f'{count} films exported in {time.perf_counter() - started:.1f} s', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+'''
+The log_indexes module creates the indexes of the raw query log collection and
+applies its retention policy.
+
+Indexes:
+    timestamp               newest-first reads (get_last_queries), time windows of
+                            every statistic; a TTL index when retention is enabled
+    query_type, timestamp   per-type reads and query rates (log_stats)
+    params.$**              wildcard index for lookups by any parameter value
+
+With LOG_RETENTION_DAYS > 0, MongoDB deletes logs older than that many days in the
+background. The rollup counters (see log_rollup) are not expired, so all-time
+statistics survive; log_rollup.rebuild() only recounts the retained logs.
+
+ensure_indexes() is idempotent and runs once per process, before the first query
+logs are stored (log_writer.store_logs) and before statistics that read the raw
+logs; after a failure it is tried again RETRY_INTERVAL seconds later.
+
+Usage:
+    python log_indexes.py [--retention-days 90]
+'''
+
+import argparse
+import time
+import settings
+import errors
+
+TIMESTAMP_INDEX = 'timestamp_ttl'
+
+# MongoDB error code of create_index for an existing index with other options.
+INDEX_OPTIONS_CONFLICT = 85
+
+# Seconds ensure_once waits after a failure before trying again.
+RETRY_INTERVAL = 60
+
+_indexes_ready = False
+_failed_at = None
+
+
+def ensure_indexes(collection=None, retention_days: float = None) -> list[str]:
+    '''
+    Creates the query log indexes and sets the TTL of the timestamp index.
+    Args:
+        collection: Log collection (default: settings.get_mongo_collection()).
+        retention_days (float): Days to keep logs, 0 to keep them forever
+                                (default: settings.LOG_RETENTION_DAYS).
+    Returns:
+        list[str]: Names of the indexes of the collection.
+    '''
+
+    from pymongo import ASCENDING, DESCENDING
+    from pymongo.errors import OperationFailure
+
+    global _indexes_ready
+    collection = collection if collection is not None else settings.get_mongo_collection()
+    retention_days = settings.LOG_RETENTION_DAYS if retention_days is None else retention_days
+
+    collection.create_index([('query_type', ASCENDING), ('timestamp', DESCENDING)])
+    collection.create_index([('params.$**', ASCENDING)])
+
+    options = {}
+    if retention_days > 0:
+        options['expireAfterSeconds'] = int(retention_days * 86400)
+    try:
+        collection.create_index([('timestamp', DESCENDING)], name=TIMESTAMP_INDEX, **options)
+    except OperationFailure as e:
+        # Only "same index, other TTL" is handled here; any other conflict (e.g. a
+        # timestamp index under another name) or error is left to the caller.
+        existing = collection.index_information().get(TIMESTAMP_INDEX)
+        if (e.code != INDEX_OPTIONS_CONFLICT or existing is None
+                or [tuple(key) for key in existing['key']] != [('timestamp', DESCENDING)]):
+            raise
+        # The index exists with another TTL: change it in place instead of rebuilding.
+        if not options:
+            # Reported once per process: the other indexes are in place.
+            _indexes_ready = True
+            errors.log_error_to_file(
+                f'Index {TIMESTAMP_INDEX} still has a TTL; drop it to keep logs forever: {e}'
+            )
+            return list(collection.index_information())
+        collection.database.command('collMod', collection.name, index={
+            'name': TIMESTAMP_INDEX, 'expireAfterSeconds': options['expireAfterSeconds'],
+        })
+
+    _indexes_ready = True
+    return list(collection.index_information())
+
+
+def ensure_once() -> None:
+    '''
+    Runs ensure_indexes until it has succeeded once in this process.
+    Errors are logged, and after one the next attempt waits RETRY_INTERVAL seconds.
+    '''
+
+    global _failed_at
+    if _indexes_ready:
+        return
+    if _failed_at is not None and time.monotonic() - _failed_at < RETRY_INTERVAL:
+        return
+    try:
+        ensure_indexes()
+        _failed_at = None
+    except Exception as e:
+        _failed_at = time.monotonic()
+        errors.log_error_to_file(f'Query log index setup failed: {e}')
+
+
+def main() -> None:
+    '''Command-line entry point: creates the indexes and prints them.'''
+
+    parser = argparse.ArgumentParser(description='Create the query log indexes.')
+    parser.add_argument('--retention-days', type=float, default=settings.LOG_RETENTION_DAYS,
+                        help='delete logs older than this many days (0 keeps them forever)')
+    args = parser.parse_args()
+
+    for name in ensure_indexes(retention_days=args.retention_days):
+        print(name)
+    settings.close_mongo_client()
+
+
+if __name__ == '__main__':
+    main()
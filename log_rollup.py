@@ -0,0 +1,226 @@
+'''
+The log_rollup module maintains a rollup collection of pre-aggregated query log
+counters, so the statistics menu does not have to scan the raw logs.
+
+Each rollup document is keyed by a compound _id and carries a `count`:
+    {'kind': 'type', 'query_type': ...}                          per query type
+    {'kind': 'param', 'query_type': ..., 'param': ..., 'value': ...}  per parameter value
+    {'kind': 'hour', 'query_type': ..., 'hour': <datetime>}       per hour bucket
+
+Counters are incremented with $inc upserts whenever logs are written, and
+rebuild() regenerates the whole collection from the raw logs.
+
+Usage:
+    python log_rollup.py --rebuild
+'''
+
+import argparse
+from datetime import datetime, timezone
+from log_schema import POSSIBLE_KEYS
+import settings
+
+_indexes_ready = False
+
+
+def _ensure_indexes(rollup) -> None:
+    global _indexes_ready
+    if not _indexes_ready:
+        from pymongo import ASCENDING, DESCENDING
+        rollup.create_index([('_id.kind', ASCENDING), ('count', DESCENDING)])
+        _indexes_ready = True
+
+
+def normalize_value(value) -> str:
+    '''Normalizes a parameter value the same way the raw-log statistics do.'''
+
+    return str(value).strip().lower()
+
+
+def rollup_updates(doc: dict) -> list:
+    '''
+    Builds the $inc upserts that account for one raw log document.
+    Args:
+        doc (dict): Log document with 'query_type', optional 'params' and 'timestamp'.
+    Returns:
+        list: pymongo UpdateOne operations (empty for documents without a query type).
+    '''
+
+    query_type = doc.get('query_type')
+    if not query_type:
+        return []
+
+    keys = [{'kind': 'type', 'query_type': query_type}]
+
+    timestamp = doc.get('timestamp')
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        hour = timestamp.replace(minute=0, second=0, microsecond=0)
+        keys.append({'kind': 'hour', 'query_type': query_type, 'hour': hour})
+
+    params = doc.get('params')
+    if isinstance(params, dict):
+        for key in POSSIBLE_KEYS:
+            value = params.get(key)
+            if value is not None and value != '':
+                keys.append({
+                    'kind': 'param',
+                    'query_type': query_type,
+                    'param': key,
+                    'value': normalize_value(value),
+                })
+
+    from pymongo import UpdateOne
+    return [UpdateOne({'_id': key}, {'$inc': {'count': 1}}, upsert=True) for key in keys]
+
+
+def record(docs: list[dict]) -> None:
+    '''
+    Adds a batch of freshly written log documents to the rollup counters.
+    Args:
+        docs (list of dict): Raw log documents.
+    Returns:
+        None
+    '''
+
+    updates = [update for doc in docs for update in rollup_updates(doc)]
+    if updates:
+        settings.get_rollup_collection().bulk_write(updates, ordered=False)
+
+
+def get_top_params(limit: int = 5) -> list[tuple[str, int]]:
+    '''
+    Returns the most popular parameter values, read from the rollup.
+    Args:
+        limit (int): Number of top items to return. Defaults to 5.
+    Returns:
+        List of tuples ('query_type.param:value', count) sorted by count descending.
+    '''
+
+    rollup = settings.get_rollup_collection()
+    _ensure_indexes(rollup)
+    cursor = rollup.find({'_id.kind': 'param'}).sort('count', -1).limit(limit)
+    return [
+        (f"{doc['_id']['query_type']}.{doc['_id']['param']}:{doc['_id']['value']}".lower(),
+         doc['count'])
+        for doc in cursor
+    ]
+
+
+def get_type_counts() -> dict:
+    '''
+    Returns the number of logged queries per query type, read from the rollup.
+    Returns:
+        dict: Mapping of query type to count.
+    '''
+
+    rollup = settings.get_rollup_collection()
+    _ensure_indexes(rollup)
+    return {doc['_id']['query_type']: doc['count'] for doc in rollup.find({'_id.kind': 'type'})}
+
+
+def get_hourly_counts(query_type: str = None, since: datetime = None) -> list[dict]:
+    '''
+    Returns per-hour query counts, read from the rollup.
+    Args:
+        query_type (str, optional): Restrict to one query type.
+        since (datetime, optional): Only buckets starting at or after this time.
+    Returns:
+        List of dicts with 'query_type', 'hour' and 'count', oldest first.
+    '''
+
+    query = {'_id.kind': 'hour'}
+    if query_type:
+        query['_id.query_type'] = query_type
+    if since is not None:
+        query['_id.hour'] = {'$gte': since}
+
+    cursor = settings.get_rollup_collection().find(query).sort('_id.hour', 1)
+    return [
+        {'query_type': doc['_id']['query_type'], 'hour': doc['_id']['hour'], 'count': doc['count']}
+        for doc in cursor
+    ]
+
+
+def _rebuild_pipelines() -> list[list[dict]]:
+    typed = {'$match': {'query_type': {'$type': 'string', '$ne': ''}}}
+    return [
+        [
+            typed,
+            {'$group': {'_id': {'kind': 'type', 'query_type': '$query_type'}, 'count': {'$sum': 1}}},
+        ],
+        [
+            typed,
+            {'$match': {'timestamp': {'$type': 'date'}}},
+            {'$group': {
+                '_id': {
+                    'kind': 'hour',
+                    'query_type': '$query_type',
+                    'hour': {'$dateTrunc': {'date': '$timestamp', 'unit': 'hour'}},
+                },
+                'count': {'$sum': 1},
+            }},
+        ],
+        [
+            typed,
+            {'$match': {'params': {'$type': 'object'}}},
+            {'$project': {'query_type': 1, 'param': {'$objectToArray': '$params'}}},
+            {'$unwind': '$param'},
+            {'$match': {'param.k': {'$in': POSSIBLE_KEYS},
+                        'param.v': {'$nin': [None, '']}}},
+            {'$group': {
+                '_id': {
+                    'kind': 'param',
+                    'query_type': '$query_type',
+                    'param': '$param.k',
+                    'value': {'$toLower': {'$trim': {'input': {'$toString': '$param.v'}}}},
+                },
+                'count': {'$sum': 1},
+            }},
+        ],
+    ]
+
+
+def rebuild() -> None:
+    '''
+    Regenerates the rollup collection from the raw query logs.
+    The counters are computed server-side into a scratch collection, which then
+    atomically replaces the rollup. Logs written while the rebuild runs are not
+    counted, so run it when the application is idle.
+    '''
+
+    logs = settings.get_mongo_collection()
+    rollup = settings.get_rollup_collection()
+    scratch = logs.database[f'{rollup.name}_rebuild']
+    scratch.drop()
+
+    for pipeline in _rebuild_pipelines():
+        logs.aggregate(pipeline + [{'$merge': {'into': scratch.name}}], allowDiskUse=True)
+
+    if scratch.estimated_document_count():
+        scratch.rename(rollup.name, dropTarget=True)
+    else:
+        rollup.drop()
+
+    global _indexes_ready
+    _indexes_ready = False
+    _ensure_indexes(rollup)
+
+
+def main() -> None:
+    '''Command-line entry point for rollup maintenance.'''
+
+    parser = argparse.ArgumentParser(description='Maintain the query log rollup collection.')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='regenerate the rollup from the raw query logs')
+    args = parser.parse_args()
+
+    if args.rebuild:
+        rebuild()
+        print('Rollup collection rebuilt.')
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
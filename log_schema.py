@@ -0,0 +1,20 @@
+'''
+The log_schema module describes the query log documents shared by the writer
+(log_writer), the rollup (log_rollup) and the statistics (log_stats).
+
+A log document looks like:
+    {'_id': ObjectId, 'query_type': str, 'params': {key: value or None}, 'timestamp': datetime}
+where params holds every key of POSSIBLE_KEYS.
+'''
+
+POSSIBLE_KEYS = [
+    'keyword',
+    'genre',
+    'year_from',
+    'year_to',
+    'first_name',
+    'last_name',
+    'min_length',
+    'max_length',
+    'rating'
+]
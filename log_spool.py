@@ -0,0 +1,282 @@
+'''
+The log_spool module keeps query logs on local disk until MongoDB has them.
+
+The query log writer (see log_writer) appends every batch to a spool segment,
+an append-only file of MongoDB Extended JSON lines, with one fsync per batch.
+Segments are sealed after SPOOL_SEGMENT_BYTES or when the replayer picks them
+up, and a SpoolReplayer thread bulk-loads sealed segments into MongoDB,
+deleting each one once it is stored. While MongoDB is slow or unreachable the
+segments simply accumulate and are retried with exponential back-off, also
+across restarts, so searches never wait for the log store.
+
+Every document carries an _id assigned when it was logged, so replaying a
+segment twice (after a crash, or by two processes sharing the spool directory)
+inserts nothing twice; duplicate key errors are ignored and only documents
+actually inserted are added to the rollup counters.
+
+Documents MongoDB keeps rejecting (validation, size limit) are written to a
+.failed segment after SPOOL_MAX_ATTEMPTS attempts and the rest of their segment
+is stored, so they cannot block the segments behind them; the .failed segment
+is kept for inspection.
+
+File names: segment-<time_ns>-<pid>.open while being written, .jsonl once sealed,
+.failed for documents given up on.
+'''
+
+import glob
+import os
+import threading
+import time
+import settings
+import errors
+
+_OPEN = '.open'
+_SEALED = '.jsonl'
+_FAILED = '.failed'
+
+
+class LogSpool:
+    '''
+    Segmented append-only spool of log documents.
+    Args:
+        directory (str): Spool directory, created if missing.
+        segment_bytes (int): Size after which the open segment is sealed.
+        fsync (bool): fsync the segment after every appended batch.
+        stale_after (float): Seconds after which an .open segment left behind by a
+                             crashed process is sealed for replay.
+    '''
+
+    def __init__(self, directory: str = settings.SPOOL_DIR,
+                 segment_bytes: int = settings.SPOOL_SEGMENT_BYTES,
+                 fsync: bool = settings.SPOOL_FSYNC,
+                 stale_after: float = settings.SPOOL_STALE_AFTER):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._file = None
+        self._path = None
+        os.makedirs(directory, exist_ok=True)
+        self._seal_stale(stale_after)
+
+    def _seal_stale(self, stale_after: float) -> None:
+        now = time.time()
+        for path in glob.glob(os.path.join(self.directory, f'segment-*{_OPEN}')):
+            try:
+                if now - os.path.getmtime(path) > stale_after:
+                    os.replace(path, path[:-len(_OPEN)] + _SEALED)
+            except OSError:
+                pass
+
+    def append(self, docs: list[dict]) -> None:
+        '''
+        Appends documents to the open segment and makes them durable.
+        Raises:
+            OSError: If the spool cannot be written.
+        '''
+
+        from bson import json_util
+
+        data = ''.join(json_util.dumps(doc) + '\n' for doc in docs).encode('utf-8')
+        with self._lock:
+            if self._file is None:
+                self._path = os.path.join(
+                    self.directory, f'segment-{time.time_ns():020d}-{os.getpid()}{_OPEN}'
+                )
+                self._file = open(self._path, 'ab')
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            if self._file.tell() >= self.segment_bytes:
+                self._seal()
+
+    def seal(self) -> None:
+        '''Seals the open segment, if any, so the replayer can load it.'''
+
+        with self._lock:
+            self._seal()
+
+    def _seal(self) -> None:
+        if self._file is None:
+            return
+        self._file.close()
+        os.replace(self._path, self._path[:-len(_OPEN)] + _SEALED)
+        self._file = None
+        self._path = None
+
+    def sealed_segments(self) -> list[str]:
+        '''Returns the paths of sealed segments, oldest first.'''
+
+        return sorted(glob.glob(os.path.join(self.directory, f'segment-*{_SEALED}')))
+
+    def close(self) -> None:
+        '''Seals the open segment; documents already appended stay on disk.'''
+
+        self.seal()
+
+
+def read_segment(path: str) -> list[dict]:
+    '''
+    Reads the documents of a segment.
+    A line that cannot be decoded (e.g. cut short by a crash) is logged and skipped.
+    '''
+
+    from bson import json_util
+
+    docs = []
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                docs.append(json_util.loads(line))
+            except ValueError as e:
+                errors.log_error_to_file(f'Skipping unreadable line {number} of {path}: {e}')
+    return docs
+
+
+def is_permanent(error: Exception) -> bool:
+    '''Tells whether storing failed because MongoDB rejected documents, not because it was unavailable.'''
+
+    from pymongo.errors import BulkWriteError
+
+    return isinstance(error, BulkWriteError) and bool(error.details.get('writeErrors'))
+
+
+class SpoolReplayer:
+    '''
+    Daemon thread loading sealed spool segments into MongoDB.
+    Every `interval` seconds it seals the open segment and stores each sealed
+    segment with `store` in chunks of `batch_size` documents, deleting the
+    segment afterwards. When storing fails, the segment is kept and the next
+    attempt is delayed, doubling up to max_backoff seconds. Documents rejected
+    by MongoDB (see is_permanent) max_attempts times are set aside in a .failed
+    segment; `set_aside` counts them.
+    Args:
+        spool (LogSpool): Spool to drain.
+        store (callable): Writes a list of documents to MongoDB, ignoring
+                          documents that are already there.
+    '''
+
+    def __init__(self, spool: LogSpool, store, interval: float = settings.SPOOL_REPLAY_INTERVAL,
+                 batch_size: int = settings.SPOOL_REPLAY_BATCH,
+                 max_backoff: float = settings.SPOOL_MAX_BACKOFF,
+                 max_attempts: int = settings.SPOOL_MAX_ATTEMPTS):
+        self.spool = spool
+        self.store = store
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.replayed = 0
+        self.failures = 0
+        self.set_aside = 0
+        self._attempts = {}
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._cond = threading.Condition()
+        self._started = 0
+        self._finished = 0
+        self._requested = 0
+        self._thread = threading.Thread(target=self._run, name='log-spool-replayer', daemon=True)
+        self._thread.start()
+
+    def replay(self) -> None:
+        '''
+        Seals the open segment and stores every sealed segment, oldest first.
+        Every chunk of a segment is stored even if MongoDB rejects documents of an
+        earlier chunk. Raises whatever `store` raised; the failed segment and later
+        ones are kept, except that after max_attempts rejections the rejected
+        documents are set aside and the segment is deleted.
+        '''
+
+        self.spool.seal()
+        for path in self.spool.sealed_segments():
+            try:
+                docs = read_segment(path)
+            except FileNotFoundError:
+                continue  # replayed by another process sharing the spool
+            rejected, failure = [], None
+            for start in range(0, len(docs), self.batch_size):
+                chunk = docs[start:start + self.batch_size]
+                try:
+                    self.store(chunk)
+                except Exception as e:
+                    if not is_permanent(e):
+                        raise
+                    failure = e
+                    rejected.extend(chunk[error['index']] for error in e.details['writeErrors']
+                                    if error.get('code') != 11000)
+            if failure is not None:
+                attempts = self._attempts.get(path, 0) + 1
+                if attempts < self.max_attempts:
+                    self._attempts[path] = attempts
+                    raise failure
+                self._set_aside(path, rejected, failure)
+            self._attempts.pop(path, None)
+            self.replayed += len(docs) - len(rejected)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _set_aside(self, path: str, docs: list[dict], error: Exception) -> None:
+        from bson import json_util
+
+        failed = path[:-len(_SEALED)] + _FAILED
+        with open(failed, 'a', encoding='utf-8') as f:
+            f.writelines(json_util.dumps(doc) + '\n' for doc in docs)
+        self.set_aside += len(docs)
+        errors.log_error_to_file(
+            f'{len(docs)} query log(s) rejected {self.max_attempts} times, moved to {failed}: {error}'
+        )
+
+    def _run(self) -> None:
+        delay = self.interval
+        while True:
+            with self._cond:
+                self._started += 1
+            try:
+                self.replay()
+                delay = self.interval
+            except Exception as e:
+                self.failures += 1
+                delay = min(max(delay, self.interval) * 2, self.max_backoff)
+                errors.log_error_to_file(f'Query log spool replay failed, retrying in {delay:.1f} s: {e}')
+            with self._cond:
+                self._finished = self._started
+                self._cond.notify_all()
+                if self._stopping.is_set() and self._finished >= self._requested:
+                    return
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def drain(self, timeout: float = None) -> bool:
+        '''
+        Asks for an immediate replay and waits until one that started after the
+        request has finished (successfully or not).
+        Returns:
+            bool: True if it finished within the timeout.
+        '''
+
+        with self._cond:
+            target = self._started + 1
+            self._requested = max(self._requested, target)
+            self._wake.set()
+            return self._cond.wait_for(lambda: self._finished >= target, timeout)
+
+    def stop(self, timeout: float = None) -> None:
+        '''
+        Makes a last replay attempt and stops the thread. Segments that could not
+        be stored stay on disk and are replayed by the next process.
+        '''
+
+        self._stopping.set()
+        self.drain(timeout)
+        self._thread.join(timeout)
+
+    def pending_segments(self) -> int:
+        '''Returns the number of sealed segments waiting for replay.'''
+
+        return len(self.spool.sealed_segments())
@@ -3,44 +3,122 @@ The log_stats module contains functions for statistical processing of query logs
 from MongoDB.
 '''
 
-import collections
-from datetime import datetime
-from log_writer import POSSIBLE_KEYS
+from datetime import datetime, timedelta, timezone
+from log_schema import POSSIBLE_KEYS
 import settings
 import display_utils
+import log_rollup
+import log_indexes
+import metrics
 
+VALID_TYPES = ['keyword', 'genre_year', 'length_range', 'actor_name', 'combined']
 
-def get_top_queries(limit: int = 5) -> list[tuple[str, int]]:
+# Default look-back window of get_query_rates per bucket unit.
+RATE_WINDOWS = {
+    'minute': timedelta(hours=1),
+    'hour': timedelta(days=1),
+    'day': timedelta(days=30),
+}
+
+
+def top_queries_pipeline(limit: int = 5, since: datetime = None) -> list[dict]:
+    '''
+    Builds the aggregation pipeline behind get_top_queries.
+    Every non-empty parameter of every log becomes one 'query_type.key:value'
+    item; MongoDB groups and counts them and returns only the top `limit`.
+    Args:
+        limit (int): Number of top items to return. Defaults to 5.
+        since (datetime, optional): Only count queries logged at or after this time.
+    Returns:
+        list[dict]: Pipeline stages for collection.aggregate.
+    '''
+
+    match = {
+        'query_type': {'$type': 'string', '$ne': ''},
+        'params': {'$type': 'object'},
+    }
+    if since is not None:
+        match['timestamp'] = {'$gte': since}
+
+    item = {'$concat': ['$query_type', '.', '$param.k', ':', {'$toString': '$param.v'}]}
+
+    return [
+        {'$match': match},
+        {'$project': {'query_type': 1, 'param': {'$objectToArray': '$params'}}},
+        {'$unwind': '$param'},
+        {'$match': {'param.k': {'$in': POSSIBLE_KEYS}, 'param.v': {'$nin': [None, '']}}},
+        {'$group': {'_id': {'$toLower': {'$trim': {'input': item}}}, 'count': {'$sum': 1}}},
+        {'$sort': {'count': -1, '_id': 1}},
+        {'$limit': limit},
+    ]
+
+
+@metrics.instrument(backend='mongo')
+def get_top_queries(limit: int = 5, since: datetime = None) -> list[tuple[str, int]]:
     '''
     Collects all parameter values from query_type and params,
     and returns the top most popular combinations.
+    All-time counts are read from the rollup collection (see log_rollup); a time
+    window is counted server-side on the raw logs (see top_queries_pipeline).
     Args:
         limit (int): Number of top items to return. Defaults to 5.
+        since (datetime, optional): Only count queries logged at or after this time.
     Returns:
         List of tuples (parameter_combination, count) sorted by count descending.
     '''
 
+    if since is None:
+        return log_rollup.get_top_params(limit)
+
+    log_indexes.ensure_once()
     collection = settings.get_mongo_collection()
-    cursor = collection.find({})
+    cursor = collection.aggregate(top_queries_pipeline(limit, since))
+    return [(doc['_id'], doc['count']) for doc in cursor]
 
-    all_items = []
 
-    for doc in cursor:
-        query_type = doc.get('query_type')
-        params = doc.get('params', {})
-        if not query_type or not isinstance(params, dict):
-            continue
+@metrics.instrument(backend='mongo')
+def get_popular_searches(limit: int = 10, since: datetime = None) -> list[dict]:
+    '''
+    Returns the most frequently logged complete searches (query type plus all params).
+    Searches are compared by their non-empty parameters only, so logs written
+    before a key was added to POSSIBLE_KEYS count with the newer ones.
+    Args:
+        limit (int): Number of searches to return. Defaults to 10.
+        since (datetime, optional): Only count queries logged at or after this time.
+    Returns:
+        List of dicts with 'query_type', 'params' and 'count', most popular first.
+    '''
 
-        for key in POSSIBLE_KEYS:
-            value = params.get(key)
-            if value is not None and value != '':
-                item = f"{query_type}.{key}:{value}".strip().lower()
-                all_items.append(item)
+    match = {'query_type': {'$type': 'string'}, 'params': {'$type': 'object'}}
+    if since is not None:
+        match['timestamp'] = {'$gte': since}
 
-    counter = collections.Counter(all_items)
-    return counter.most_common(limit)
+    pipeline = [
+        {'$match': match},
+        {'$group': {
+            '_id': {'query_type': '$query_type', 'params': {'$sortArray': {
+                'input': {'$filter': {
+                    'input': {'$objectToArray': '$params'},
+                    'cond': {'$not': [{'$in': ['$$this.v', [None, '']]}]},
+                }},
+                'sortBy': {'k': 1},
+            }}},
+            'params': {'$first': '$params'},
+            'count': {'$sum': 1},
+            'last_seen': {'$max': '$timestamp'},
+        }},
+        {'$sort': {'count': -1, 'last_seen': -1}},
+        {'$limit': limit},
+    ]
+
+    collection = settings.get_mongo_collection()
+    return [
+        {'query_type': doc['_id']['query_type'], 'params': doc['params'], 'count': doc['count']}
+        for doc in collection.aggregate(pipeline, allowDiskUse=True)
+    ]
 
 
+@metrics.instrument(backend='mongo')
 def get_last_queries(limit: int = 10) -> list[dict]:
     '''
     Fetches the most recent search queries from the logs.
@@ -50,46 +128,119 @@ def get_last_queries(limit: int = 10) -> list[dict]:
         List of MongoDB documents representing recent query logs, sorted by timestamp descending.
     '''
 
+    log_indexes.ensure_once()
     collection = settings.get_mongo_collection()
     return list(collection.find({}).sort('timestamp', -1).limit(limit))
 
 
-def get_queries_by_type(query_type: str, limit: int = 5, fetch_limit: int = 100) -> list[dict]:
+@metrics.instrument(backend='mongo')
+def get_queries_by_type(query_type: str, limit: int = 5) -> list[dict]:
     '''
-    Retrieves up to `limit` unique entries by query_type,
-    uniqueness based on params, from the last `fetch_limit` records.
+    Retrieves the `limit` most recently used distinct parameter combinations of a
+    query type. Deduplication runs server-side over the whole history: logs are
+    grouped by their non-empty parameters (in key order), keeping the latest use
+    and a count per combination.
     Args:
         query_type (str): The query type to filter by.
-        limit (int): Maximum number of unique results to return. Defaults to 5.
-        fetch_limit (int): Number of recent records to fetch from DB. Defaults to 100.
+        limit (int): Number of distinct combinations to return. Defaults to 5.
     Returns:
-        List of unique query documents filtered by query_type.
+        List of dicts with '_id' (latest log), 'query_type', 'params', 'timestamp'
+        (latest use) and 'count', most recent first.
     '''
 
+    pipeline = [
+        {'$match': {'query_type': query_type, 'params': {'$type': 'object'}}},
+        {'$sort': {'timestamp': -1}},
+        {'$group': {
+            '_id': {'$sortArray': {
+                'input': {'$filter': {
+                    'input': {'$objectToArray': '$params'},
+                    'cond': {'$not': [{'$in': ['$$this.v', [None, '']]}]},
+                }},
+                'sortBy': {'k': 1},
+            }},
+            'log_id': {'$first': '$_id'},
+            'params': {'$first': '$params'},
+            'timestamp': {'$first': '$timestamp'},
+            'count': {'$sum': 1},
+        }},
+        {'$sort': {'timestamp': -1, 'log_id': -1}},
+        {'$limit': limit},
+        {'$project': {
+            '_id': '$log_id',
+            'query_type': {'$literal': query_type},
+            'params': 1,
+            'timestamp': 1,
+            'count': 1,
+        }},
+    ]
+
+    log_indexes.ensure_once()
     collection = settings.get_mongo_collection()
+    return list(collection.aggregate(pipeline, allowDiskUse=True))
+
 
-    recent = list(collection.find({'query_type': query_type}).sort('timestamp', -1).limit(fetch_limit))
+@metrics.instrument(backend='mongo')
+def get_query_rates(unit: str = 'hour', since: datetime = None, query_type: str = None) -> list[dict]:
+    '''
+    Counts logged queries per time bucket and query type with $dateTrunc.
+    Only the look-back window is read, through the timestamp indexes (see
+    log_indexes), so the cost does not grow with the history.
+    Args:
+        unit (str): Bucket size: 'minute', 'hour' or 'day'.
+        since (datetime, optional): Start of the window (default: RATE_WINDOWS[unit] ago).
+        query_type (str, optional): Restrict to one query type.
+    Returns:
+        List of dicts with 'bucket' (UTC start of the bucket), 'query_type' and 'count',
+        oldest bucket first.
+    '''
+
+    if unit not in RATE_WINDOWS:
+        raise ValueError(f'Unknown time unit: {unit}')
+    if since is None:
+        since = datetime.now(timezone.utc) - RATE_WINDOWS[unit]
+
+    match = {'timestamp': {'$gte': since}}
+    if query_type:
+        match['query_type'] = query_type
 
-    unique_params = set()
-    unique_results = []
+    pipeline = [
+        {'$match': match},
+        {'$group': {
+            '_id': {
+                'bucket': {'$dateTrunc': {'date': '$timestamp', 'unit': unit}},
+                'query_type': '$query_type',
+            },
+            'count': {'$sum': 1},
+        }},
+        {'$sort': {'_id.bucket': 1, '_id.query_type': 1}},
+    ]
 
-    for doc in recent:
-        params = doc.get('params', {})
-        params_tuple = tuple(sorted(params.items()))
+    log_indexes.ensure_once()
+    collection = settings.get_mongo_collection()
+    return [
+        {'bucket': doc['_id']['bucket'], 'query_type': doc['_id']['query_type'], 'count': doc['count']}
+        for doc in collection.aggregate(pipeline)
+    ]
 
-        if params_tuple not in unique_params:
-            unique_params.add(params_tuple)
-            unique_results.append(doc)
 
-            if len(unique_results) >= limit:
-                break
+@metrics.instrument(backend='mongo')
+def get_query_counts() -> dict:
+    '''
+    Returns the number of logged queries for every known query type.
+    Returns:
+        dict: Mapping of query type to count (0 for types never logged).
+    '''
 
-    return unique_results
+    counts = log_rollup.get_type_counts()
+    return {q_type: counts.get(q_type, 0) for q_type in VALID_TYPES}
 
 
+@metrics.instrument(backend='mongo')
 def handle_query_count(query_type: str = None, show: bool = False) -> None:
     '''
     Logs a query type occurrence in MongoDB and optionally displays counts per query type.
+    Counts are kept in and read from the rollup collection (see log_rollup).
     Args:
         query_type (str, optional): The type of query to log. If invalid, a warning is printed.
         show (bool): If True, displays the count of queries per type.
@@ -99,31 +250,16 @@ def handle_query_count(query_type: str = None, show: bool = False) -> None:
 
     collection = settings.get_mongo_collection()
 
-    valid_types = ['keyword', 'genre_year', 'length_range', 'actor_name']
-
     if query_type:
-        if query_type in valid_types:
-            collection.insert_one({
+        if query_type in VALID_TYPES:
+            doc = {
                 'query_type': query_type,
                 'timestamp': datetime.utcnow()
-            })
+            }
+            collection.insert_one(doc)
+            log_rollup.record([doc])
         else:
             print(f'Warning: Unknown query type "{query_type}"')
 
     if show:
-        pipeline = [
-            {
-                '$group': {
-                    '_id': '$query_type',
-                    'count': {'$sum': 1}
-                }
-            }
-        ]
-        results = list(collection.aggregate(pipeline))
-        counts = {item['_id']: item['count'] for item in results}
-
-        data = []
-        for q_type in valid_types:
-            data.append([q_type, counts.get(q_type, 0)])
-
-        display_utils.display_query_counts_table(dict(data))
+        display_utils.display_query_counts_table(get_query_counts())
@@ -1,42 +1,326 @@
 '''
 The log_writer module contains functions for writing and formatting query logs
 to MongoDB and displaying them in a tabular format.
+
+Query logs are written behind the interactive path: log_query only queues the
+document, and a background QueryLogWriter thread appends queued documents in
+batches to the local disk spool (see log_spool), from which a replayer thread
+loads them into MongoDB with insert_many and adds them to the statistics rollup
+(see log_rollup). With SPOOL_ENABLED=0 the writer thread stores batches in
+MongoDB directly. Call shutdown() before exiting to flush what is left.
 '''
 
+import queue
+import threading
+import time
 from datetime import datetime, timezone
-from tabulate import tabulate
+from log_schema import POSSIBLE_KEYS
 import settings
+import errors
+import log_rollup
+import log_indexes
+import log_spool
+import metrics
+
+# Queued by shutdown() to stop the writer thread.
+_STOP = object()
+
+
+class QueryLogWriter:
+    '''
+    Write-behind buffer for query log documents.
+    A daemon thread drains a bounded queue and writes the collected documents once
+    batch_size documents are waiting or flush_interval seconds have passed since
+    the first of them was queued: to the disk spool when `spool` is on (falling back
+    to MongoDB if the spool cannot be written), otherwise to MongoDB with store_logs.
+    Back-pressure: when the queue is full, put() waits up to enqueue_timeout
+    seconds and then drops the document, counting it in `dropped`.
+    '''
+
+    def __init__(self, batch_size: int = settings.LOG_BATCH_SIZE,
+                 flush_interval: float = settings.LOG_FLUSH_INTERVAL,
+                 max_queue: int = settings.LOG_QUEUE_MAXSIZE,
+                 enqueue_timeout: float = settings.LOG_ENQUEUE_TIMEOUT,
+                 spool: bool = settings.SPOOL_ENABLED):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.written = 0
+        self.spooled = 0
+        self.dropped = 0
+        self.failed = 0
+        self.spool = None
+        self.replayer = None
+        if spool:
+            try:
+                self.spool = log_spool.LogSpool()
+                self.replayer = log_spool.SpoolReplayer(self.spool, store_logs)
+            except OSError as e:
+                self.spool = None
+                errors.log_error_to_file(f'Query log spool unavailable, writing to MongoDB: {e}')
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='query-log-writer', daemon=True)
+        self._thread.start()
+
+    def put(self, document: dict) -> bool:
+        '''
+        Queues a log document without waiting for MongoDB.
+        Args:
+            document (dict): Log document to store.
+        Returns:
+            bool: False if the queue stayed full and the document was dropped.
+        '''
+
+        try:
+            self._queue.put(document, timeout=self.enqueue_timeout)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self, timeout: float = None) -> bool:
+        '''
+        Writes every document queued so far, through the spool if it is used.
+        Args:
+            timeout (float, optional): Maximum seconds to wait for the write.
+        Returns:
+            bool: True if the flush completed within the timeout.
+        '''
+
+        if self._stopping:
+            # The thread writes everything queued before it stops.
+            self._thread.join(timeout)
+            return not self._thread.is_alive()
+        done = threading.Event()
+        if not self._enqueue(done, timeout) or not self._wait(done, timeout):
+            return False
+        if self.replayer is not None:
+            return self.replayer.drain(timeout)
+        return True
+
+    def shutdown(self, timeout: float = None) -> None:
+        '''
+        Flushes the remaining documents and stops the background threads.
+        Documents that cannot reach MongoDB within the spool's shutdown timeout
+        stay in the spool and are loaded by the next process.
+        Args:
+            timeout (float, optional): Maximum seconds to wait for the final flush.
+        '''
+
+        if self._stopping:
+            return
+        self._stopping = True
+        if self._enqueue(_STOP, timeout):
+            self._thread.join(timeout)
+        if self.replayer is not None:
+            self.replayer.stop(settings.SPOOL_SHUTDOWN_TIMEOUT if timeout is None else timeout)
+            self.spool.close()
+
+    def _enqueue(self, item, timeout: float = None) -> bool:
+        # Blocks like put() but gives up when the timeout passes or the writer
+        # thread is gone, so a full queue nobody drains cannot hang the caller.
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._thread.is_alive():
+            wait = 0.1 if deadline is None else min(0.1, deadline - time.monotonic())
+            if wait <= 0:
+                return False
+            try:
+                self._queue.put(item, timeout=wait)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _wait(self, event: threading.Event, timeout: float = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not event.is_set() and self._thread.is_alive():
+            wait = 0.1 if deadline is None else min(0.1, deadline - time.monotonic())
+            if wait <= 0:
+                return False
+            event.wait(wait)
+        return event.is_set()
+
+    def stats(self) -> dict:
+        '''Returns counters of written, spooled, dropped, failed and pending documents.'''
+
+        stats = {
+            'written': self.written,
+            'spooled': self.spooled,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'pending': self._queue.qsize(),
+        }
+        if self.replayer is not None:
+            stats['replayed'] = self.replayer.replayed
+            stats['spool_segments'] = self.replayer.pending_segments()
+            stats['spool_set_aside'] = self.replayer.set_aside
+        return stats
+
+    def _run(self) -> None:
+        batch = []
+        deadline = None
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                # Whatever was queued behind the stop sentinel still gets written.
+                documents, events = self._drain_queue()
+                self._write(batch + documents)
+                for event in events:
+                    event.set()
+                return
+
+            if isinstance(item, threading.Event):
+                self._write(batch)
+                batch = []
+                item.set()
+                continue
+
+            if item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+
+            if batch and (item is None or len(batch) >= self.batch_size):
+                self._write(batch)
+                batch = []
+
+    def _drain_queue(self) -> tuple[list[dict], list[threading.Event]]:
+        documents, events = [], []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return documents, events
+            (events if isinstance(item, threading.Event) else documents).append(item)
+
+    def _write(self, batch: list[dict]) -> None:
+        if not batch:
+            return
+        if self.spool is not None:
+            try:
+                self.spool.append(batch)
+                self.spooled += len(batch)
+                return
+            except Exception as e:
+                errors.log_error_to_file(f'Query log spool write failed, writing to MongoDB: {e}')
+        try:
+            self.written += store_logs(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            errors.log_error_to_file(f'Query log write failed ({len(batch)} documents): {e}')
+
+
+@metrics.instrument('log_writer.store', backend='mongo')
+def store_logs(docs: list[dict]) -> int:
+    '''
+    Inserts log documents into MongoDB and adds them to the rollup.
+    Documents whose _id is already stored (a replayed spool segment) are skipped
+    without error, so storing the same documents twice is harmless.
+    Documents are inserted with a rollup_pending flag that is removed once the
+    rollup has counted them. When an earlier attempt inserted some documents and
+    then failed before the rollup update (e.g. on a lost connection), storing the
+    batch again counts the duplicates that are still pending.
+    Args:
+        docs (list[dict]): Log documents, normally with pre-assigned _id.
+    Returns:
+        int: Number of documents newly inserted.
+    Raises:
+        pymongo.errors.PyMongoError: For failures other than duplicate ids. After a
+        BulkWriteError the documents that were inserted are still counted; after
+        other failures they are counted when the batch is stored again.
+    '''
+
+    from pymongo.errors import BulkWriteError
+
+    log_indexes.ensure_once()
+    collection = settings.get_mongo_collection()
+    pending = [dict(doc, rollup_pending=True) for doc in docs]
+    failure = None
+    duplicate_ids = []
+    try:
+        collection.insert_many(pending, ordered=False)
+        inserted = pending
+    except BulkWriteError as e:
+        write_errors = e.details.get('writeErrors', [])
+        rejected = {error['index'] for error in write_errors}
+        inserted = [doc for index, doc in enumerate(pending) if index not in rejected]
+        duplicate_ids = [pending[error['index']]['_id'] for error in write_errors
+                         if error.get('code') == 11000]
+        if len(duplicate_ids) < len(write_errors):
+            failure = e
+
+    counted = list(inserted)
+    try:
+        if duplicate_ids:
+            counted.extend(collection.find({'_id': {'$in': duplicate_ids}, 'rollup_pending': True}))
+        log_rollup.record(counted)
+        if counted:
+            collection.update_many({'_id': {'$in': [doc['_id'] for doc in counted]}},
+                                   {'$unset': {'rollup_pending': ''}})
+    except Exception as e:
+        errors.log_error_to_file(f'Query log rollup update failed: {e}')
+    if failure is not None:
+        raise failure
+    return len(inserted)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> QueryLogWriter:
+    '''Returns the shared QueryLogWriter, starting it on first use.'''
+
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = QueryLogWriter()
+        return _writer
 
-POSSIBLE_KEYS = [
-    'keyword',
-    'genre',
-    'year_from',
-    'year_to',
-    'first_name',
-    'last_name',
-    'min_length',
-    'max_length'
-]
 
 def log_query(query_type: str, query_params: dict) -> None:
     '''
-    Writes a query log to MongoDB with fixed keys.
+    Queues a query log for MongoDB with fixed keys.
     query_type: Type of the query (e.g., 'genre_year', 'actor_partial', etc.).
     query_params: Dictionary with query parameters.
     '''
 
+    from bson import ObjectId
+
     base_params = {key: None for key in POSSIBLE_KEYS}
     base_params.update(query_params)
 
-    collection = settings.get_mongo_collection()
-
-    collection.insert_one({
+    get_writer().put({
+        '_id': ObjectId(),
         'query_type': query_type,
         'params': base_params,
         'timestamp': datetime.now(timezone.utc)
     })
 
 
+def flush(timeout: float = None) -> None:
+    '''Writes all queued query logs, if the writer was ever started.'''
+
+    if _writer is not None:
+        _writer.flush(timeout)
+
+
+def shutdown(timeout: float = None) -> None:
+    '''Flushes queued query logs and stops the background writer.'''
+
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.shutdown(timeout)
+
+
 def format_mongo_logs(logs: list[dict]) -> str:
     '''
     Formats a list of logs from MongoDB into a tabular representation.
@@ -57,5 +341,6 @@ def format_mongo_logs(logs: list[dict]) -> str:
         )
         table.append([query_type, params_str, time_str])
 
+    from tabulate import tabulate
     headers = ['Query Type', 'Parameters', 'Time']
     return tabulate(table, headers=headers, tablefmt='fancy_grid', stralign='left')
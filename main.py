@@ -2,20 +2,30 @@
 Main module: запуск программы, обработка меню и подключение к БД.
 '''
 
+from pymysql.err import MySQLError
 import display_utils
 import ui
 import settings
+import log_writer
+import cache_warmup
+import catalog_watch
+import mysql_connector
+import metrics
+import slow_query_log
 
 def main() -> None:
     '''
     Main entry point of the program.
-    Establishes connections to MySQL and MongoDB, displays a welcome message,
-    and starts the main menu loop to handle user choices:
+    Sets up the MySQL connection pool, starts the metrics exporters, the
+    result cache warm-up and the catalog refresh watcher in the background,
+    displays a welcome message, and starts the main menu loop to handle user
+    choices (MySQL and MongoDB connect lazily on first use):
     - Perform film searches
     - Show query statistics
     - Exit the program with confirmation
-    Catches and reports any unexpected exceptions and ensures that the
-    database connection is properly closed upon exit.
+    Catches and reports any unexpected exceptions and ensures that queued
+    query logs are flushed and the database clients are properly closed
+    upon exit.
     Args:
         None
     Returns:
@@ -26,7 +36,17 @@ def main() -> None:
 '''
     connection_query = None
     try:
-        connection_query = settings.create_mysql_connection()
+        connection_query = settings.get_mysql_pool()
+        try:
+            warning = mysql_connector.select_film_source(connection_query)
+        except MySQLError as e:
+            warning = f'Could not check the film_extended table: {e}'
+        if warning:
+            print(display_utils.colorize(f'\n{warning}', 'red'))
+        metrics.start()
+        if settings.WARMUP_ENABLED:
+            cache_warmup.start_background(connection_query)
+        catalog_watch.start_background(connection_query)
 
         message = '\nWelcome to the Sakila database movie search system.'
         print(display_utils.colorize(message, 'yellow'))
@@ -51,8 +71,13 @@ def main() -> None:
         print(f'{display_utils.colorize(f"\nAn unexpected error occurred: {e}", "red")}')
 
     finally:
-        if connection_query:
-            connection_query.close()
+        cache_warmup.stop()
+        catalog_watch.stop()
+        log_writer.shutdown()
+        metrics.stop()
+        slow_query_log.shutdown(timeout=2)
+        settings.close_mysql_pool()
+        settings.close_mongo_client()
 
 if __name__ == '__main__':
     main()
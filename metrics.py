@@ -0,0 +1,419 @@
+'''
+The metrics module records latency and database traffic of the application.
+
+Functions decorated with instrument() feed a latency histogram per function.
+UI handlers mark user actions (action() or instrument(action_label=...)): every
+MySQL and MongoDB call made on the same thread while an action runs is added to
+that action, giving histograms of latency, round-trips, rows returned and bytes
+fetched per action. MySQL traffic is counted by the cursors of mysql_connector
+(see track_cursor); MongoDB calls count one round-trip each.
+
+The metrics are exposed in the Prometheus text format on a local HTTP endpoint
+(METRICS_PORT) and/or rewritten to a file (METRICS_FILE, e.g. for the node_exporter
+textfile collector), and summarized in the statistics menu.
+
+With METRICS_ENABLED=0 (the default) a decorated call costs one flag check and
+cursors are not wrapped.
+'''
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+import settings
+import errors
+
+PREFIX = 'sakila'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 10000)
+BYTE_BUCKETS = (0, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+_local = threading.local()
+_stop = threading.Event()
+_threads = []
+_server = None
+
+
+class Histogram:
+    '''Cumulative histogram with fixed upper bounds, as exported to Prometheus.'''
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        '''Upper bound of the bucket holding the q-quantile (inf if above all buckets).'''
+
+        target, seen = q * self.count, 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float('inf')
+
+
+class Registry:
+    '''Thread-safe store of labelled histograms and counters.'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+
+    def observe(self, name: str, value: float, buckets: tuple, help_text: str, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+                self._help[name] = help_text
+            histogram.observe(value)
+
+    def inc(self, name: str, value: float, help_text: str, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._help[name] = help_text
+
+    def histograms(self, name: str) -> dict:
+        '''Returns {labels: (count, sum, p95)} of one histogram family.'''
+
+        with self._lock:
+            return {
+                labels: (h.count, h.sum, h.quantile(0.95))
+                for (family, labels), h in self._histograms.items() if family == name
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self) -> str:
+        '''Returns all metrics in the Prometheus text exposition format.'''
+
+        lines, described = [], set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.append(f'# HELP {name} {self._help.get(name, name)}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            for (name, labels), h in sorted(self._histograms.items()):
+                describe(name, 'histogram')
+                cumulative = 0
+                for bound, count in zip(h.buckets + (float('inf'),), h.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{_labels(labels, le=le)} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {h.sum}')
+                lines.append(f'{name}_count{_labels(labels)} {h.count}')
+            for (name, labels), value in sorted(self._counters.items()):
+                describe(name, 'counter')
+                lines.append(f'{name}{_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels: tuple, **extra) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+REGISTRY = Registry()
+
+
+def enabled() -> bool:
+    '''Returns True when metrics are being recorded.'''
+
+    return settings.METRICS_ENABLED
+
+
+def _state():
+    if not hasattr(_local, 'action'):
+        _local.action = None
+        _local.functions = []
+        _local.backends = []
+    return _local
+
+
+def record_db(backend: str, round_trips: int = 0, rows: int = 0, nbytes: int = 0) -> None:
+    '''
+    Adds database traffic to the totals of the innermost instrumented function
+    and to the action running on this thread, if any.
+    '''
+
+    state = _state()
+    function = state.functions[-1] if state.functions else 'unknown'
+    if round_trips:
+        REGISTRY.inc(f'{PREFIX}_db_round_trips_total', round_trips,
+                     'Database round-trips.', backend=backend, function=function)
+    if rows:
+        REGISTRY.inc(f'{PREFIX}_db_rows_total', rows,
+                     'Rows or documents returned.', backend=backend, function=function)
+    if nbytes:
+        REGISTRY.inc(f'{PREFIX}_db_bytes_total', nbytes,
+                     'Approximate bytes fetched.', backend=backend, function=function)
+    if state.action is not None:
+        state.action['round_trips'] += round_trips
+        state.action['rows'] += rows
+        state.action['bytes'] += nbytes
+
+
+def _row_bytes(row) -> int:
+    values = row.values() if isinstance(row, dict) else row
+    return sum(len(v) if isinstance(v, (str, bytes)) else 8 for v in values)
+
+
+class _TrackedCursor:
+    '''Cursor proxy counting executes as round-trips and the rows and bytes fetched.'''
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def execute(self, *args, **kwargs):
+        record_db('mysql', round_trips=1)
+        return self._cursor.execute(*args, **kwargs)
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        record_db('mysql', rows=len(rows), nbytes=sum(_row_bytes(row) for row in rows))
+        return rows
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            record_db('mysql', rows=1, nbytes=_row_bytes(row))
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size)
+        record_db('mysql', rows=len(rows), nbytes=sum(_row_bytes(row) for row in rows))
+        return rows
+
+
+def track_cursor(cursor):
+    '''Wraps a DB-API cursor so its traffic is recorded; returns it unchanged when disabled.'''
+
+    if not settings.METRICS_ENABLED:
+        return cursor
+    return _TrackedCursor(cursor)
+
+
+@contextmanager
+def action(label: str):
+    '''
+    Context manager measuring one user action: its latency and the database
+    round-trips, rows and bytes of every instrumented call made inside it on
+    this thread. Use it where a decorated handler would also time user input.
+    '''
+
+    if not settings.METRICS_ENABLED:
+        yield
+        return
+
+    state = _state()
+    outer = state.action
+    state.action = totals = {'round_trips': 0, 'rows': 0, 'bytes': 0}
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        state.action = outer
+        elapsed = time.perf_counter() - started
+        REGISTRY.observe(f'{PREFIX}_action_latency_seconds', elapsed, LATENCY_BUCKETS,
+                         'Latency of user actions.', action=label)
+        REGISTRY.observe(f'{PREFIX}_action_round_trips', totals['round_trips'], ROUND_TRIP_BUCKETS,
+                         'Database round-trips per user action.', action=label)
+        REGISTRY.observe(f'{PREFIX}_action_rows', totals['rows'], ROW_BUCKETS,
+                         'Rows returned per user action.', action=label)
+        REGISTRY.observe(f'{PREFIX}_action_bytes', totals['bytes'], BYTE_BUCKETS,
+                         'Approximate bytes fetched per user action.', action=label)
+
+
+def instrument(name: str = None, action_label: str = None, backend: str = None):
+    '''
+    Decorator recording the latency of every call of a function.
+    Args:
+        name (str): Metric label; defaults to module.function.
+        action_label (str): Also measure every call as a user action (see action()).
+        backend (str): 'mongo' for functions talking to MongoDB directly: each call
+                       (outside another call of the same backend) counts one round-trip
+                       and the length of a list or dict result as rows.
+    Returns:
+        Callable: The wrapped function.
+    '''
+
+    def decorator(func):
+        label = name or f'{func.__module__}.{func.__qualname__}'
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not settings.METRICS_ENABLED:
+                return func(*args, **kwargs)
+            if action_label:
+                with action(action_label):
+                    return _call(func, label, backend, args, kwargs)
+            return _call(func, label, backend, args, kwargs)
+
+        return wrapper
+    return decorator
+
+
+def _call(func, label: str, backend: str, args: tuple, kwargs: dict):
+    state = _state()
+    outermost = backend is not None and backend not in state.backends
+    state.functions.append(label)
+    state.backends.append(backend)
+    started = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+        if outermost:
+            rows = len(result) if isinstance(result, (list, dict)) else 0
+            record_db(backend, round_trips=1, rows=rows)
+        return result
+    except Exception:
+        REGISTRY.inc(f'{PREFIX}_function_errors_total', 1,
+                     'Calls that raised an exception.', function=label)
+        raise
+    finally:
+        state.functions.pop()
+        state.backends.pop()
+        REGISTRY.observe(f'{PREFIX}_function_latency_seconds', time.perf_counter() - started,
+                         LATENCY_BUCKETS, 'Latency of instrumented functions.', function=label)
+
+
+def render() -> str:
+    '''Returns the current metrics in the Prometheus text format.'''
+
+    return REGISTRY.render()
+
+
+def summary() -> dict:
+    '''
+    Summarizes the latency histograms for display.
+    Returns:
+        dict: 'kind name' -> 'calls, average and approximate p95 latency'.
+    '''
+
+    result = {}
+    for kind in ('action', 'function'):
+        families = REGISTRY.histograms(f'{PREFIX}_{kind}_latency_seconds')
+        for labels, (count, total, p95) in sorted(families.items()):
+            p95_text = '> 10 s' if p95 == float('inf') else f'<= {p95 * 1000:g} ms'
+            result[f'{kind} {dict(labels)[kind]}'] = (
+                f'{count} calls, avg {total / count * 1000:.1f} ms, p95 {p95_text}'
+            )
+    return result
+
+
+def write_file(path: str = None) -> None:
+    '''Atomically rewrites the metrics file (METRICS_FILE by default).'''
+
+    path = path or settings.METRICS_FILE
+    if not path:
+        return
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(render())
+    os.replace(tmp, path)
+
+
+def _write_periodically(interval: float) -> None:
+    while not _stop.wait(interval):
+        try:
+            write_file()
+        except OSError as e:
+            errors.log_error_to_file(f'Writing metrics file failed: {e}')
+
+
+def _serve(port: int):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer(('127.0.0.1', port), Handler)
+
+
+def start(port: int = None, interval: float = None) -> None:
+    '''
+    Starts the exporters configured in settings: the HTTP endpoint
+    (http://127.0.0.1:METRICS_PORT/metrics) and the periodic file writer.
+    Does nothing when metrics are disabled.
+    '''
+
+    global _server
+    if not settings.METRICS_ENABLED:
+        return
+    port = settings.METRICS_PORT if port is None else port
+    interval = settings.METRICS_FILE_INTERVAL if interval is None else interval
+    _stop.clear()
+
+    if port:
+        try:
+            _server = _serve(port)
+        except OSError as e:
+            errors.log_error_to_file(f'Metrics endpoint on port {port} not started: {e}')
+        else:
+            _threads.append(threading.Thread(target=_server.serve_forever, name='metrics-http',
+                                             daemon=True))
+    if settings.METRICS_FILE:
+        _threads.append(threading.Thread(target=_write_periodically, args=(interval,),
+                                         name='metrics-file', daemon=True))
+    for thread in _threads:
+        thread.start()
+
+
+def stop(timeout: float = 1.0) -> None:
+    '''Stops the exporters and writes the metrics file one last time.'''
+
+    global _server
+    _stop.set()
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
+    for thread in _threads:
+        thread.join(timeout)
+    _threads.clear()
+    if settings.METRICS_ENABLED:
+        try:
+            write_file()
+        except OSError as e:
+            errors.log_error_to_file(f'Writing metrics file failed: {e}')
@@ -1,40 +1,282 @@
 '''
-Module for connecting to a MySQL database and executing queries on the film_extended_view.
+Module for connecting to a MySQL database and executing queries on the film data.
 Contains functions to search films by various criteria and obtain statistics.
+Queries read from settings.FILM_SOURCE: the indexed, materialized film_extended
+table by default, or film_extended_view. Every function accepts either a plain
+connection or a settings.MySQLPool as `conn`. Search results are served from the
+shared result cache when possible (see result_cache).
+
+Searches use keyset (seek) pagination: instead of LIMIT/OFFSET, each page resumes
+right after the cursor token (sort_value, film_id) of the last row seen, so every
+page costs the same no matter how deep the user goes. They return the light
+LIST_COLUMNS projection by default; get_film_details loads one complete film.
 '''
 
-def search_by_keyword(conn, keyword, offset=0, limit=10):
+import base64
+import json
+from contextlib import contextmanager
+from pymysql.cursors import SSDictCursor
+from pymysql.err import ProgrammingError
+import settings
+import title_index
+import result_cache
+import metrics
+import slow_query_log
+
+PAGE_SIZE = 10
+
+# Columns fetched for result lists: only what display_utils.display_films_table
+# shows, with the description cut to its first 50 characters. Full film data
+# (description, actors, rental terms) is loaded on demand by get_film_details.
+LIST_COLUMNS = (
+    'film_id',
+    'title',
+    'SUBSTRING(description, 1, 50) AS description',
+    'release_year',
+    'length',
+    'rating',
+)
+
+# Columns written by stream_search: the complete film record.
+EXPORT_COLUMNS = (
+    'film_id',
+    'title',
+    'description',
+    'release_year',
+    'category',
+    'rental_duration',
+    'rental_rate',
+    'length',
+    'rating',
+    'actors',
+)
+
+# Searched instead of film_extended until that table has been built (see select_film_source).
+FALLBACK_FILM_SOURCE = 'film_extended_view'
+
+# MySQL error code for a missing table.
+ER_NO_SUCH_TABLE = 1146
+
+_source_fallback = False
+
+SORT_KEYS = {
+    'keyword': 'title',
+    'genre_year': 'release_year',
+    'actor_name': 'title',
+    'length_range': 'length',
+    'combined': 'title',
+}
+
+# Filters accepted by the combined search (search_combined, faceted_search).
+COMBINED_FILTERS = (
+    'keyword', 'genre', 'rating', 'year_from', 'year_to',
+    'min_length', 'max_length', 'first_name', 'last_name',
+)
+
+# Width of the release year and length facet buckets.
+YEAR_BUCKET = 5
+LENGTH_BUCKET = 30
+
+
+@contextmanager
+def _cursor(conn):
+    '''
+    Opens a cursor on a plain connection, or on a connection checked out of a
+    settings.MySQLPool for the duration of the block. Its round-trips, rows and
+    bytes are recorded by metrics, and slow executions by slow_query_log, when
+    enabled.
+    conn: pymysql connection or settings.MySQLPool.
+    '''
+
+    if isinstance(conn, settings.MySQLPool):
+        with conn.connection() as pooled, pooled.cursor() as cursor:
+            yield slow_query_log.track_cursor(metrics.track_cursor(cursor))
+    else:
+        with conn.cursor() as cursor:
+            yield slow_query_log.track_cursor(metrics.track_cursor(cursor))
+
+
+@contextmanager
+def _unbuffered_cursor(conn):
+    '''
+    Like _cursor, but opens an unbuffered SSDictCursor: rows are read from the
+    server as they are fetched instead of being loaded into client memory first.
+    The connection cannot run other statements until the cursor is closed.
+    conn: pymysql connection or settings.MySQLPool.
+    '''
+
+    if isinstance(conn, settings.MySQLPool):
+        with conn.connection() as pooled, pooled.cursor(SSDictCursor) as cursor:
+            yield slow_query_log.track_cursor(metrics.track_cursor(cursor), unbuffered=True)
+    else:
+        with conn.cursor(SSDictCursor) as cursor:
+            yield slow_query_log.track_cursor(metrics.track_cursor(cursor), unbuffered=True)
+
+
+def next_cursor(results, sort_key):
+    '''
+    Builds the cursor token that resumes a search right after the given page.
+    results: Page of films returned by a search function.
+    sort_key: Column the search is ordered by (see SORT_KEYS).
+    return: Tuple (sort_value, film_id) of the last row, or None for an empty page.
+    '''
+
+    if not results:
+        return None
+    last = results[-1]
+    return last[sort_key], last['film_id']
+
+
+def encode_cursor(after):
+    '''
+    Turns a cursor token into an opaque URL-safe string (e.g. for HTTP clients).
+    after: Cursor token from next_cursor, or None.
+    return: String token, or None.
+    '''
+
+    if after is None:
+        return None
+    raw = json.dumps(list(after), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(token):
+    '''
+    Reverses encode_cursor.
+    token: String token, or None/empty.
+    return: Cursor token tuple, or None.
+    Raises ValueError for a malformed token.
+    '''
+
+    if not token:
+        return None
+    try:
+        value, film_id = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f'Invalid cursor token: {token}') from e
+    return value, film_id
+
+
+def _seek(sort_key, after):
+    '''
+    Builds the keyset condition and ORDER BY clause for one page.
+    sort_key: Column the search is ordered by; film_id breaks ties.
+    after: Cursor token from next_cursor, or None for the first page.
+    return: Tuple (condition, params, order_by); condition is empty on the first page.
+    '''
+
+    order_by = f'ORDER BY {sort_key}, film_id '
+    if after is None:
+        return '', (), order_by
+
+    value, film_id = after
+    condition = f'AND ({sort_key} > %s OR ({sort_key} = %s AND film_id > %s)) '
+    return condition, (value, value, film_id), order_by
+
+
+@metrics.instrument()
+def get_film_titles(conn):
+    '''
+    Get a snapshot of all film titles.
+    return: List of (film_id, title) pairs.
+    '''
+
+    with _cursor(conn) as cursor:
+        cursor.execute(f'SELECT DISTINCT film_id, title FROM {settings.FILM_SOURCE};')
+        return [(row['film_id'], row['title']) for row in cursor.fetchall()]
+
+
+@metrics.instrument()
+def get_films_by_ids(conn, film_ids, columns=LIST_COLUMNS):
+    '''
+    Get films by id, keeping the order of the given ids.
+    film_ids: List of film ids.
+    columns: Column projection (SQL select expressions).
+    return: List of films.
+    '''
+
+    if not film_ids:
+        return []
+
+    placeholders = ', '.join(['%s'] * len(film_ids))
+    with _cursor(conn) as cursor:
+        cursor.execute(
+            f'SELECT {", ".join(columns)} FROM {settings.FILM_SOURCE} '
+            f'WHERE film_id IN ({placeholders});',
+            tuple(film_ids)
+        )
+        rows = cursor.fetchall()
+
+    position = {film_id: i for i, film_id in enumerate(film_ids)}
+    return sorted(rows, key=lambda row: position[row['film_id']])
+
+
+@metrics.instrument()
+def get_film_details(conn, film_id):
+    '''
+    Get the full record of one film, including the complete description and actors.
+    film_id: Film id.
+    return: Dict with all film columns (categories joined with ', '), or None if not found.
+    '''
+
+    with _cursor(conn) as cursor:
+        cursor.execute(
+            f'SELECT * FROM {settings.FILM_SOURCE} WHERE film_id = %s ORDER BY category;',
+            (film_id,)
+        )
+        rows = cursor.fetchall()
+
+    if not rows:
+        return None
+    film = dict(rows[0])
+    film['category'] = ', '.join(row['category'] for row in rows)
+    return film
+
+
+@result_cache.cached
+@metrics.instrument()
+def search_by_keyword(conn, keyword, after=None, limit=PAGE_SIZE, *, columns=LIST_COLUMNS):
     '''
     Search films by keyword in the title.
-    keyword: Keyword for searching (used with LIKE %keyword%).
-    offset: Offset for pagination.
+    With settings.TITLE_INDEX_ENABLED the matches come from the trigram index
+    (see title_index) and only those films are fetched from MySQL.
+    keyword: Keyword for searching (used with LIKE %keyword%, case-insensitive collation).
+    after: Cursor token of the previous page (see next_cursor), None for the first page.
     limit: Number of records to return.
-    return: List of films matching the query.
+    columns: Column projection (SQL select expressions); must include the sort column.
+    return: List of films matching the query, ordered by title.
     '''
 
-    with conn.cursor() as cursor:
+    if settings.TITLE_INDEX_ENABLED:
+        index = title_index.get_index(lambda: get_film_titles(conn))
+        return get_films_by_ids(conn, index.page(keyword, after, limit), columns)
+
+    seek, seek_params, order_by = _seek(SORT_KEYS['keyword'], after)
+    with _cursor(conn) as cursor:
         query = (
-            'SELECT * FROM film_extended_view '
-            'WHERE UPPER(title) LIKE UPPER(%s) '
-            'LIMIT %s OFFSET %s;'
+            f'SELECT {", ".join(columns)} FROM {settings.FILM_SOURCE} '
+            'WHERE title LIKE %s '
+            f'{seek}{order_by}'
+            'LIMIT %s;'
         )
-        cursor.execute(query, (f'%{keyword}%', limit, offset))
+        cursor.execute(query, (f'%{keyword}%', *seek_params, limit))
         return cursor.fetchall()
 
 
+@metrics.instrument()
 def get_genres_and_year_range(conn):
     '''
     Retrieves the list of unique genres and the range of release years.
     return: List of genres, minimum year, maximum year.
     '''
 
-    with conn.cursor() as cursor:
-        cursor.execute('SELECT DISTINCT category FROM film_extended_view;')
+    with _cursor(conn) as cursor:
+        cursor.execute(f'SELECT DISTINCT category FROM {settings.FILM_SOURCE};')
         genres = [row['category'] for row in cursor.fetchall()]
 
         cursor.execute(
             'SELECT MIN(release_year) AS min_year, MAX(release_year) AS max_year '
-            'FROM film_extended_view;'
+            f'FROM {settings.FILM_SOURCE};'
         )
         result = cursor.fetchone()
         min_year, max_year = result['min_year'], result['max_year']
@@ -42,79 +284,451 @@ def get_genres_and_year_range(conn):
     return genres, min_year, max_year
 
 
-def search_by_genre_and_years(conn, genre, year_from, year_to,*, offset=0, limit=10):
+@result_cache.cached
+@metrics.instrument()
+def search_by_genre_and_years(conn, genre, year_from, year_to, *, after=None, limit=PAGE_SIZE,
+                              columns=LIST_COLUMNS):
     '''
     Search films by genre and release year range.
     genre: Film genre.
     year_from: Starting year.
     year_to: Ending year.
-    offset: Offset for pagination.
+    after: Cursor token of the previous page (see next_cursor), None for the first page.
     limit: Number of records to return.
-    return: List of films matching the filter.
+    columns: Column projection (SQL select expressions); must include the sort column.
+    return: List of films matching the filter, ordered by release year.
     '''
 
-    with conn.cursor() as cursor:
+    seek, seek_params, order_by = _seek(SORT_KEYS['genre_year'], after)
+    with _cursor(conn) as cursor:
         query = (
-            'SELECT * FROM film_extended_view '
-            'WHERE LOWER(category) = LOWER(%s) '
+            f'SELECT {", ".join(columns)} FROM {settings.FILM_SOURCE} '
+            'WHERE category = %s '
             'AND release_year BETWEEN %s AND %s '
-            'LIMIT %s OFFSET %s;'
+            f'{seek}{order_by}'
+            'LIMIT %s;'
         )
-        cursor.execute(query, (genre, year_from, year_to, limit, offset))
+        cursor.execute(query, (genre, year_from, year_to, *seek_params, limit))
         return cursor.fetchall()
 
 
-def search_by_actor_name_partial(conn, name_part, offset=0, limit=10):
+@result_cache.cached
+@metrics.instrument()
+def search_by_actor_name_partial(conn, name_part, after=None, limit=PAGE_SIZE, *,
+                                 columns=LIST_COLUMNS):
     '''
     Search films by partial actor's first or last name.
+    Matches anywhere in the aggregated actors list; search_by_actor_name is the
+    faster, per-actor alternative.
     name_part: Fragment of the actor's first or last name.
-    offset: Offset for pagination.
+    after: Cursor token of the previous page (see next_cursor), None for the first page.
     limit: Number of records to return.
-    return: List of films where actor matches the name fragment.
+    columns: Column projection (SQL select expressions); must include the sort column.
+    return: List of films where actor matches the name fragment, ordered by title.
     '''
 
-    with conn.cursor() as cursor:
+    seek, seek_params, order_by = _seek(SORT_KEYS['actor_name'], after)
+    with _cursor(conn) as cursor:
         query = (
-            'SELECT * FROM film_extended_view '
+            f'SELECT {", ".join(columns)} FROM {settings.FILM_SOURCE} '
             'WHERE UPPER(actors) LIKE UPPER(%s) '
-            'LIMIT %s OFFSET %s;'
+            f'{seek}{order_by}'
+            'LIMIT %s;'
         )
         pattern = f'%{name_part}%'
-        cursor.execute(query, (pattern, limit, offset))
+        cursor.execute(query, (pattern, *seek_params, limit))
         return cursor.fetchall()
 
 
+def _like_prefix(text):
+    '''Escapes LIKE wildcards in text and turns it into a prefix pattern.'''
+
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'{escaped}%'
+
+
+def _actor_filter(first_name, last_name):
+    '''
+    Builds the film_actor semi-join of search_by_actor_name.
+    return: Tuple (condition, params); condition is empty when both names are empty.
+    '''
+
+    conditions, params = [], []
+    if first_name:
+        conditions.append('a.first_name LIKE %s')
+        params.append(_like_prefix(first_name))
+    if last_name:
+        conditions.append('a.last_name LIKE %s')
+        params.append(_like_prefix(last_name))
+
+    if not conditions:
+        return '', []
+    condition = (
+        'AND film_id IN ('
+        'SELECT fa.film_id FROM actor a '
+        'JOIN film_actor fa ON fa.actor_id = a.actor_id '
+        f'WHERE {" AND ".join(conditions)}) '
+    )
+    return condition, params
+
+
+@result_cache.cached
+@metrics.instrument()
+def search_by_actor_name(conn, first_name='', last_name='', *, after=None, limit=PAGE_SIZE,
+                         columns=LIST_COLUMNS):
+    '''
+    Search films by actor using the normalized actor and film_actor tables.
+    Name fragments are matched as prefixes of the same actor's first and last name,
+    so the indexes on actor(first_name) and actor(last_name) can be used and a search
+    never matches across neighbouring actors. Films are then selected by id
+    through film_actor.
+    first_name: Beginning of the actor's first name (may be empty).
+    last_name: Beginning of the actor's last name (may be empty).
+    after: Cursor token of the previous page (see next_cursor), None for the first page.
+    limit: Number of records to return.
+    columns: Column projection (SQL select expressions); must include the sort column.
+    return: List of films featuring a matching actor, ordered by title.
+    '''
+
+    actor_filter, params = _actor_filter(first_name, last_name)
+    seek, seek_params, order_by = _seek(SORT_KEYS['actor_name'], after)
+    with _cursor(conn) as cursor:
+        query = (
+            f'SELECT {", ".join(columns)} FROM {settings.FILM_SOURCE} '
+            'WHERE 1 = 1 '
+            f'{actor_filter}{seek}{order_by}'
+            'LIMIT %s;'
+        )
+        cursor.execute(query, (*params, *seek_params, limit))
+        return cursor.fetchall()
+
+
+@metrics.instrument()
 def get_length_range(conn):
     '''
     Get the minimum and maximum film length in the database.
     return: Minimum length, maximum length in minutes.
     '''
 
-    with conn.cursor() as cursor:
+    with _cursor(conn) as cursor:
         query = (
             'SELECT MIN(length) AS min_length, MAX(length) AS max_length '
-            'FROM film_extended_view;'
+            f'FROM {settings.FILM_SOURCE};'
         )
         cursor.execute(query)
         result = cursor.fetchone()
     return result['min_length'], result['max_length']
 
 
-def search_by_length_range(conn, length_from: int, length_to: int, offset=0, limit=10):
+@metrics.instrument()
+def get_catalog_metadata(conn):
+    '''
+    Get the genres together with the release year and length ranges in one round-trip.
+    return: Dict with 'genres' (sorted list), 'min_year', 'max_year', 'min_length', 'max_length'.
+    '''
+
+    with _cursor(conn) as cursor:
+        query = (
+            'SELECT category, '
+            'MIN(release_year) AS min_year, MAX(release_year) AS max_year, '
+            'MIN(length) AS min_length, MAX(length) AS max_length '
+            f'FROM {settings.FILM_SOURCE} '
+            'GROUP BY category ORDER BY category;'
+        )
+        cursor.execute(query)
+        rows = cursor.fetchall()
+
+    def bound(func, column):
+        values = [row[column] for row in rows if row[column] is not None]
+        return func(values) if values else None
+
+    return {
+        'genres': [row['category'] for row in rows],
+        'min_year': bound(min, 'min_year'),
+        'max_year': bound(max, 'max_year'),
+        'min_length': bound(min, 'min_length'),
+        'max_length': bound(max, 'max_length'),
+    }
+
+
+@metrics.instrument()
+def get_refresh_watermark(conn):
+    '''
+    Get the time up to which film_extended was last refreshed (see refresh_film_extended).
+    return: Datetime, or None if film_extended was never refreshed.
+    '''
+
+    with _cursor(conn) as cursor:
+        cursor.execute('SELECT refreshed_until FROM film_extended_refresh WHERE id = 1;')
+        row = cursor.fetchone()
+    return row['refreshed_until'] if row else None
+
+
+def select_film_source(conn):
+    '''
+    Points settings.FILM_SOURCE at film_extended_view while the film_extended table
+    has never been filled by refresh_film_extended.py (no refresh watermark, or the
+    tables are missing), since it would answer every search with nothing; and back
+    at film_extended once a refresh watermark exists. Other sources are left alone.
+    return: Message telling the user to run the refresh while falling back, else None.
+    '''
+
+    global _source_fallback
+    if settings.FILM_SOURCE != 'film_extended' and not _source_fallback:
+        return None
+    try:
+        watermark = get_refresh_watermark(conn)
+    except ProgrammingError as e:
+        if e.args[0] != ER_NO_SUCH_TABLE:
+            raise
+        watermark = None
+
+    if watermark is None:
+        settings.FILM_SOURCE = FALLBACK_FILM_SOURCE
+        _source_fallback = True
+        return (
+            f'film_extended has not been built yet, searching the slower {FALLBACK_FILM_SOURCE}. '
+            'Run: python refresh_film_extended.py --full'
+        )
+    if _source_fallback:
+        settings.FILM_SOURCE = 'film_extended'
+        _source_fallback = False
+    return None
+
+
+def using_fallback_source():
+    '''
+    Tells whether select_film_source has switched the searches to film_extended_view.
+    return: True while falling back.
+    '''
+
+    return _source_fallback
+
+
+def _combined_filter(filters):
+    '''
+    Builds the WHERE conditions of a combined search; empty filters are skipped.
+    filters: Dict with any of the COMBINED_FILTERS.
+    return: Tuple (condition, params).
+    '''
+
+    conditions, params = [], []
+    if filters.get('keyword'):
+        conditions.append('AND title LIKE %s ')
+        params.append(f'%{filters["keyword"]}%')
+    if filters.get('genre'):
+        conditions.append('AND category = %s ')
+        params.append(filters['genre'])
+    if filters.get('rating'):
+        conditions.append('AND rating = %s ')
+        params.append(filters['rating'])
+    for name, condition in (('year_from', 'release_year >= %s'), ('year_to', 'release_year <= %s'),
+                            ('min_length', 'length >= %s'), ('max_length', 'length <= %s')):
+        if filters.get(name) is not None:
+            conditions.append(f'AND {condition} ')
+            params.append(filters[name])
+
+    actor_condition, actor_params = _actor_filter(filters.get('first_name') or '',
+                                                  filters.get('last_name') or '')
+    return ''.join(conditions) + actor_condition, params + actor_params
+
+
+@result_cache.cached
+@metrics.instrument()
+def search_combined(conn, keyword=None, genre=None, rating=None, year_from=None, year_to=None,
+                    min_length=None, max_length=None, first_name=None, last_name=None, *,
+                    after=None, limit=PAGE_SIZE, columns=LIST_COLUMNS):
+    '''
+    Search films by any combination of keyword, genre, rating, release year range,
+    length range and actor name prefixes; filters left as None or empty are ignored.
+    faceted_search returns the same first page together with facet counts.
+    after: Cursor token of the previous page (see next_cursor), None for the first page.
+    limit: Number of records to return.
+    columns: Column projection (SQL select expressions); must include the sort column.
+    return: List of films matching every given filter, ordered by title.
+    '''
+
+    condition, params = _combined_filter({
+        'keyword': keyword, 'genre': genre, 'rating': rating,
+        'year_from': year_from, 'year_to': year_to,
+        'min_length': min_length, 'max_length': max_length,
+        'first_name': first_name, 'last_name': last_name,
+    })
+    seek, seek_params, order_by = _seek(SORT_KEYS['combined'], after)
+    with _cursor(conn) as cursor:
+        query = (
+            f'SELECT {", ".join(columns)} FROM {settings.FILM_SOURCE} '
+            f'WHERE 1 = 1 {condition}{seek}{order_by}'
+            'LIMIT %s;'
+        )
+        cursor.execute(query, (*params, *seek_params, limit))
+        return cursor.fetchall()
+
+
+@metrics.instrument()
+def faceted_search(conn, filters, after=None, limit=PAGE_SIZE, columns=LIST_COLUMNS):
+    '''
+    One page of a combined search plus facet counts and the total, in a single statement.
+    The matching films are selected once in a CTE; the page, the total and the
+    counts per genre, rating, release year bucket and length bucket are read from it
+    and returned together through UNION ALL, so drilling down costs one round-trip.
+    filters: Dict with any of the COMBINED_FILTERS (see search_combined).
+    after: Cursor token of the previous page (see next_cursor), None for the first page.
+    limit: Number of records to return.
+    columns: Column projection (SQL select expressions); must include the sort column.
+    return: Dict with 'films' (the page), 'total' (number of matching films) and
+            'facets': {'genre', 'rating', 'year', 'length'} -> list of (value, count);
+            year and length values are the lower bounds of their buckets.
+    '''
+
+    condition, params = _combined_filter(filters)
+    seek, seek_params, order_by = _seek(SORT_KEYS['combined'], after)
+    padding = ', '.join(['NULL'] * len(columns))
+    facets = {
+        'genre': 'category',
+        'rating': 'rating',
+        'year': f'release_year - release_year %% {YEAR_BUCKET}',
+        'length': f'length - length %% {LENGTH_BUCKET}',
+    }
+
+    query = (
+        f'WITH matched AS (SELECT * FROM {settings.FILM_SOURCE} WHERE 1 = 1 {condition}) '
+        'SELECT \'film\' AS facet_kind, NULL AS facet_value, NULL AS facet_count, page.* FROM ('
+        f'SELECT {", ".join(columns)} FROM matched WHERE 1 = 1 {seek}{order_by}LIMIT %s'
+        ') AS page '
+        f'UNION ALL SELECT \'total\', NULL, COUNT(DISTINCT film_id), {padding} FROM matched '
+    )
+    for kind, expression in facets.items():
+        query += (
+            f'UNION ALL SELECT \'{kind}\', {expression}, COUNT(DISTINCT film_id), {padding} '
+            f'FROM matched WHERE {expression} IS NOT NULL GROUP BY {expression} '
+        )
+
+    with _cursor(conn) as cursor:
+        cursor.execute(query + ';', (*params, *seek_params, limit))
+        rows = cursor.fetchall()
+
+    result = {'films': [], 'total': 0, 'facets': {kind: [] for kind in facets}}
+    for row in rows:
+        kind = row.pop('facet_kind')
+        value, count = row.pop('facet_value'), row.pop('facet_count')
+        if kind == 'film':
+            result['films'].append(row)
+        elif kind == 'total':
+            result['total'] = int(count)
+        else:
+            if kind in ('year', 'length'):
+                value = int(value)
+            result['facets'][kind].append((value, int(count)))
+
+    # UNION ALL does not keep the page order of its first branch.
+    sort_key = SORT_KEYS['combined']
+    result['films'].sort(key=lambda film: (film[sort_key], film['film_id']))
+    for values in result['facets'].values():
+        values.sort()
+    return result
+
+
+@result_cache.cached
+@metrics.instrument()
+def search_by_length_range(conn, length_from: int, length_to: int, after=None, limit=PAGE_SIZE, *,
+                           columns=LIST_COLUMNS):
     '''
     Search films by length range.
     length_from: Minimum film length (in minutes).
     length_to: Maximum film length (in minutes).
-    offset: Offset for pagination.
+    after: Cursor token of the previous page (see next_cursor), None for the first page.
     limit: Number of records to return.
-    return: List of films matching the filter.
+    columns: Column projection (SQL select expressions); must include the sort column.
+    return: List of films matching the filter, ordered by length.
     '''
 
-    with conn.cursor() as cursor:
+    seek, seek_params, order_by = _seek(SORT_KEYS['length_range'], after)
+    with _cursor(conn) as cursor:
         query = (
-            'SELECT * FROM film_extended_view '
+            f'SELECT {", ".join(columns)} FROM {settings.FILM_SOURCE} '
             'WHERE length BETWEEN %s AND %s '
-            'LIMIT %s OFFSET %s;'
+            f'{seek}{order_by}'
+            'LIMIT %s;'
         )
-        cursor.execute(query, (length_from, length_to, limit, offset))
+        cursor.execute(query, (length_from, length_to, *seek_params, limit))
         return cursor.fetchall()
+
+
+def run_search(conn, query_type, params, after=None, limit=PAGE_SIZE, columns=LIST_COLUMNS):
+    '''
+    Runs one page of a search described the way query logs describe it.
+    query_type: 'keyword', 'genre_year', 'actor_name', 'length_range' or 'combined'.
+    params: Dict of query parameters as written by log_writer.log_query.
+    after: Cursor token of the previous page (see next_cursor), None for the first page.
+    limit: Number of records to return.
+    columns: Column projection (SQL select expressions); must include the sort column.
+    return: List of films, as returned by the matching search function.
+    '''
+
+    if query_type == 'keyword':
+        return search_by_keyword(conn, params.get('keyword') or '', after, limit, columns=columns)
+
+    if query_type == 'genre_year':
+        return search_by_genre_and_years(
+            conn, params['genre'], params['year_from'], params['year_to'],
+            after=after, limit=limit, columns=columns
+        )
+
+    if query_type == 'actor_name':
+        return search_by_actor_name(
+            conn, params.get('first_name') or '', params.get('last_name') or '',
+            after=after, limit=limit, columns=columns
+        )
+
+    if query_type == 'length_range':
+        return search_by_length_range(
+            conn, params['min_length'], params['max_length'], after, limit, columns=columns
+        )
+
+    if query_type == 'combined':
+        filters = {name: params.get(name) for name in COMBINED_FILTERS}
+        return search_combined(conn, **filters, after=after, limit=limit, columns=columns)
+
+    raise ValueError(f'Unknown query type: {query_type}')
+
+
+def stream_search(conn, query_type, params, columns=EXPORT_COLUMNS, batch_size=1000):
+    '''
+    Yields every film matching a search, in the search's order, through an
+    unbuffered server-side cursor, so memory use does not grow with the number
+    of matches. Bypasses the result cache and the title index.
+    query_type: 'keyword', 'genre_year', 'actor_name', 'length_range' or 'combined'.
+    params: Dict of query parameters as written by log_writer.log_query.
+    columns: Column projection (SQL select expressions).
+    batch_size: Rows fetched from the server per round-trip.
+    return: Iterator of film dicts.
+    '''
+
+    if query_type == 'keyword':
+        condition, values = 'AND title LIKE %s ', [f'%{params.get("keyword") or ""}%']
+    elif query_type == 'genre_year':
+        condition = 'AND category = %s AND release_year BETWEEN %s AND %s '
+        values = [params['genre'], params['year_from'], params['year_to']]
+    elif query_type == 'actor_name':
+        condition, values = _actor_filter(params.get('first_name') or '',
+                                          params.get('last_name') or '')
+    elif query_type == 'length_range':
+        condition, values = 'AND length BETWEEN %s AND %s ', [params['min_length'], params['max_length']]
+    elif query_type == 'combined':
+        condition, values = _combined_filter(params)
+    else:
+        raise ValueError(f'Unknown query type: {query_type}')
+
+    _, _, order_by = _seek(SORT_KEYS[query_type], None)
+    with _unbuffered_cursor(conn) as cursor:
+        cursor.execute(
+            f'SELECT {", ".join(columns)} FROM {settings.FILM_SOURCE} '
+            f'WHERE 1 = 1 {condition}{order_by};',
+            values
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
@@ -0,0 +1,72 @@
+'''
+The prefetch module fetches the next page of a search on a worker thread while
+the user is still reading the current one.
+
+The worker runs the search through mysql_connector.run_search. With a
+settings.MySQLPool it checks out its own connection, so the interactive
+connection is never shared. A plain connection cannot be shared across
+threads, so with one the next page is simply fetched on demand.
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+import mysql_connector
+import settings
+
+
+class PagePrefetcher:
+    '''
+    Fetches pages of one search ahead of time.
+    Args:
+        conn: settings.MySQLPool (enables prefetching) or a plain connection.
+        query_type (str): Search type accepted by mysql_connector.run_search.
+        params (dict): Search parameters.
+    '''
+
+    def __init__(self, conn, query_type: str, params: dict):
+        self.conn = conn
+        self.query_type = query_type
+        self.params = params
+        self._after = None
+        self._future = None
+        self._executor = None
+        if isinstance(conn, settings.MySQLPool):
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='page-prefetch')
+
+    def start(self, after) -> None:
+        '''
+        Starts fetching the page that follows the cursor token `after`.
+        Any page prefetched earlier and not collected is discarded.
+        '''
+
+        self.cancel()
+        self._after = after
+        if self._executor is not None:
+            self._future = self._executor.submit(
+                mysql_connector.run_search, self.conn, self.query_type, self.params, after
+            )
+
+    def result(self) -> list:
+        '''
+        Returns the page requested with start(), waiting for it if it is still loading.
+        Raises whatever the search raised.
+        '''
+
+        future, self._future = self._future, None
+        if future is not None:
+            return future.result()
+        return mysql_connector.run_search(self.conn, self.query_type, self.params, self._after)
+
+    def cancel(self) -> None:
+        '''Discards the prefetched page; a query already running finishes in the background.'''
+
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+
+    def close(self) -> None:
+        '''Discards any prefetched page and stops the worker thread.'''
+
+        self.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,169 @@
+'''
+Module refresh_film_extended keeps the materialized film_extended table
+(see create_table_film_extended.sql) in sync with the Sakila source tables.
+
+An incremental refresh collects the film_ids whose rows in film, film_category,
+film_actor, actor or category have a last_update newer than the stored watermark,
+and rebuilds only those films. Rows removed from film_actor/film_category leave no
+last_update trace, so run a full refresh after deleting links.
+
+last_update has one-second precision and a change can commit after this refresh
+read the source tables, so the stored watermark is WATERMARK_OVERLAP seconds
+before the refresh started and the next refresh compares with >=. Films changed
+in the overlap are rebuilt twice, which is harmless.
+
+refresh() clears the caches of the process it runs in; other running processes
+(the interactive app, the HTTP service) pick up the new watermark through
+catalog_watch.
+
+Usage:
+    python refresh_film_extended.py          # incremental
+    python refresh_film_extended.py --full   # rebuild everything
+'''
+
+import argparse
+from datetime import timedelta
+import settings
+import catalog_cache
+import title_index
+import result_cache
+
+CHUNK_SIZE = 500
+
+# Seconds the incremental windows of consecutive refreshes overlap.
+WATERMARK_OVERLAP = 60
+
+SOURCE_SELECT = (
+    'SELECT f.film_id, f.title, f.description, f.release_year, f.rental_duration, '
+    'f.rental_rate, f.length, f.rating, c.name AS category, '
+    "GROUP_CONCAT(CONCAT(a.first_name, ' ', a.last_name) SEPARATOR ', ') AS actors "
+    'FROM film f '
+    'JOIN film_category fc ON f.film_id = fc.film_id '
+    'JOIN category c ON fc.category_id = c.category_id '
+    'JOIN film_actor fa ON f.film_id = fa.film_id '
+    'JOIN actor a ON fa.actor_id = a.actor_id '
+)
+
+SOURCE_GROUP_BY = (
+    'GROUP BY f.film_id, f.title, f.description, f.release_year, f.rental_duration, '
+    'f.rental_rate, f.length, f.rating, c.name'
+)
+
+INSERT_COLUMNS = (
+    'INSERT INTO film_extended (film_id, title, description, release_year, rental_duration, '
+    'rental_rate, length, rating, category, actors) '
+)
+
+CHANGED_FILMS = (
+    'SELECT film_id FROM film WHERE last_update >= %(since)s '
+    'UNION SELECT film_id FROM film_category WHERE last_update >= %(since)s '
+    'UNION SELECT film_id FROM film_actor WHERE last_update >= %(since)s '
+    'UNION SELECT fa.film_id FROM film_actor fa '
+    'JOIN actor a ON fa.actor_id = a.actor_id WHERE a.last_update >= %(since)s '
+    'UNION SELECT fc.film_id FROM film_category fc '
+    'JOIN category c ON fc.category_id = c.category_id WHERE c.last_update >= %(since)s;'
+)
+
+
+def get_watermark(cursor):
+    '''
+    Returns the time up to which film_extended is known to be fresh.
+    return: Datetime of the last refresh, or None if it was never refreshed.
+    '''
+
+    cursor.execute('SELECT refreshed_until FROM film_extended_refresh WHERE id = 1;')
+    row = cursor.fetchone()
+    return row['refreshed_until'] if row else None
+
+
+def _store_watermark(cursor, refreshed_until) -> None:
+    cursor.execute(
+        'INSERT INTO film_extended_refresh (id, refreshed_until) VALUES (1, %s) '
+        'ON DUPLICATE KEY UPDATE refreshed_until = VALUES(refreshed_until);',
+        (refreshed_until,)
+    )
+
+
+def _rebuild_films(cursor, film_ids: list[int]) -> None:
+    '''
+    Replaces the film_extended rows of the given films with fresh aggregates.
+    Films that no longer exist in the source tables simply disappear.
+    '''
+
+    for start in range(0, len(film_ids), CHUNK_SIZE):
+        chunk = film_ids[start:start + CHUNK_SIZE]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        cursor.execute(f'DELETE FROM film_extended WHERE film_id IN ({placeholders});', chunk)
+        cursor.execute(
+            f'{INSERT_COLUMNS}{SOURCE_SELECT}'
+            f'WHERE f.film_id IN ({placeholders}) {SOURCE_GROUP_BY};',
+            chunk
+        )
+
+
+def refresh(conn, full: bool = False) -> int:
+    '''
+    Brings film_extended up to date in a single transaction.
+    Args:
+        conn: Open MySQL connection.
+        full (bool): Rebuild the whole table instead of the changed films only.
+                     Also used automatically on the very first refresh.
+    Returns:
+        int: Number of films rebuilt (-1 for a full rebuild).
+    '''
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT NOW() AS now;')
+            started_at = cursor.fetchone()['now']
+            since = None if full else get_watermark(cursor)
+
+            if since is None:
+                cursor.execute('DELETE FROM film_extended;')
+                cursor.execute(f'{INSERT_COLUMNS}{SOURCE_SELECT}{SOURCE_GROUP_BY};')
+                rebuilt = -1
+            else:
+                cursor.execute(CHANGED_FILMS, {'since': since})
+                film_ids = [row['film_id'] for row in cursor.fetchall()]
+                cursor.execute(
+                    'SELECT DISTINCT fe.film_id FROM film_extended fe '
+                    'LEFT JOIN film f ON f.film_id = fe.film_id WHERE f.film_id IS NULL;'
+                )
+                film_ids.extend(row['film_id'] for row in cursor.fetchall())
+                _rebuild_films(cursor, sorted(set(film_ids)))
+                rebuilt = len(set(film_ids))
+
+            _store_watermark(cursor, started_at - timedelta(seconds=WATERMARK_OVERLAP))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    catalog_cache.invalidate()
+    title_index.invalidate()
+    result_cache.invalidate()
+
+    return rebuilt
+
+
+def main() -> None:
+    '''Command-line entry point for refreshing film_extended.'''
+
+    parser = argparse.ArgumentParser(description='Refresh the materialized film_extended table.')
+    parser.add_argument('--full', action='store_true', help='rebuild every film')
+    args = parser.parse_args()
+
+    conn = settings.create_mysql_connection()
+    try:
+        rebuilt = refresh(conn, full=args.full)
+    finally:
+        conn.close()
+
+    if rebuilt < 0:
+        print('film_extended fully rebuilt.')
+    else:
+        print(f'film_extended refreshed: {rebuilt} film(s) rebuilt.')
+
+
+if __name__ == '__main__':
+    main()
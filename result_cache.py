@@ -0,0 +1,205 @@
+'''
+The result_cache module provides an in-memory LRU cache with a per-entry TTL for
+film search results.
+
+Entries are keyed by the search function name and its normalized parameters
+(strings stripped and lower-cased, the connection argument dropped), so repeated
+searches with the same criteria and page cursor are answered without MySQL.
+Memory is bounded by an entry count and an approximate byte size; the least
+recently used entries are evicted first. invalidate() clears everything and is
+called whenever the catalog is refreshed.
+'''
+
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+import settings
+
+
+def approximate_size(value) -> int:
+    '''
+    Estimates the memory footprint of a cached search result in bytes.
+    Counts the text length of every value plus a fixed overhead per row.
+    '''
+
+    if isinstance(value, list):
+        return sum(approximate_size(item) for item in value) + 64
+    if isinstance(value, dict):
+        return sum(len(str(key)) + approximate_size(item) for key, item in value.items()) + 64
+    return len(str(value)) + 16
+
+
+def normalize(value):
+    '''Normalizes a search parameter so equivalent searches share a cache key.'''
+
+    if isinstance(value, str):
+        return value.strip().lower()
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(item) for item in value)
+    return value
+
+
+class ResultCache:
+    '''
+    Thread-safe LRU cache with a time-to-live per entry and hit/miss counters.
+    Args:
+        max_entries (int): Maximum number of cached results.
+        max_bytes (int): Maximum approximate size of all cached results.
+        ttl (float): Seconds an entry stays valid.
+    '''
+
+    def __init__(self, max_entries: int = settings.RESULT_CACHE_MAX_ENTRIES,
+                 max_bytes: int = settings.RESULT_CACHE_MAX_BYTES,
+                 ttl: float = settings.RESULT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+            'miss_time_total': 0.0,
+        }
+
+    def get(self, key) -> tuple[bool, object]:
+        '''
+        Looks up a key and marks it as recently used.
+        Returns:
+            tuple: (found, value); value is None when not found or expired.
+        '''
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._drop(key)
+                self._counters['expirations'] += 1
+                entry = None
+            if entry is None:
+                self._counters['misses'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return True, entry[1]
+
+    def put(self, key, value, miss_time: float = 0.0) -> None:
+        '''
+        Stores a value, evicting least recently used entries to stay within bounds.
+        Args:
+            key: Cache key.
+            value: Result to cache.
+            miss_time (float): Seconds the uncached call took; used to estimate time saved.
+        '''
+
+        size = approximate_size(value)
+        with self._lock:
+            self._counters['miss_time_total'] += miss_time
+            if size > self.max_bytes:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._counters['evictions'] += 1
+
+    def _drop(self, key) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate(self) -> None:
+        '''Removes every cached result.'''
+
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._counters['invalidations'] += 1
+
+    def stats(self) -> dict:
+        '''
+        Returns cache counters, size, hit rate and the estimated time saved.
+        The time saved is the number of hits times the average uncached call time.
+        '''
+
+        with self._lock:
+            counters = dict(self._counters)
+            entries, size = len(self._entries), self._bytes
+
+        lookups = counters['hits'] + counters['misses']
+        average_miss = counters['miss_time_total'] / counters['misses'] if counters['misses'] else 0.0
+        return {
+            'entries': entries,
+            'approx_bytes': size,
+            'hits': counters['hits'],
+            'misses': counters['misses'],
+            'hit_rate': round(counters['hits'] / lookups, 3) if lookups else 0.0,
+            'evictions': counters['evictions'],
+            'expirations': counters['expirations'],
+            'invalidations': counters['invalidations'],
+            'avg_miss_ms': round(average_miss * 1000, 2),
+            'est_time_saved_s': round(counters['hits'] * average_miss, 3),
+        }
+
+
+_cache = ResultCache()
+
+
+def get_cache() -> ResultCache:
+    '''Returns the shared search result cache.'''
+
+    return _cache
+
+
+def make_key(func, args: tuple, kwargs: dict) -> tuple:
+    '''
+    Builds the cache key of a search call: function name plus normalized arguments.
+    Defaults are applied so positional and keyword calls share a key; `conn` is ignored.
+    '''
+
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    params = tuple(
+        (name, normalize(value)) for name, value in bound.arguments.items() if name != 'conn'
+    )
+    return (func.__name__, params)
+
+
+def cached(func):
+    '''
+    Decorator that serves a search function from the shared result cache.
+    When settings.RESULT_CACHE_ENABLED is off the function is returned unchanged.
+    '''
+
+    if not settings.RESULT_CACHE_ENABLED:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        key = make_key(func, args, kwargs)
+        found, value = _cache.get(key)
+        if found:
+            return list(value)
+        started = time.perf_counter()
+        value = func(*args, **kwargs)
+        _cache.put(key, list(value), time.perf_counter() - started)
+        return value
+    return wrapper
+
+
+def invalidate() -> None:
+    '''Clears the shared result cache, e.g. after the catalog was refreshed.'''
+
+    _cache.invalidate()
+
+
+def stats() -> dict:
+    '''Returns the counters of the shared result cache.'''
+
+    return _cache.stats()
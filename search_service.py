@@ -0,0 +1,425 @@
+'''
+Asyncio HTTP/JSON service exposing the film searches and query statistics.
+
+Endpoints (GET, JSON responses):
+    /search/keyword?keyword=...
+    /search/genre_year?genre=...&year_from=...&year_to=...
+    /search/actor_name?first_name=...&last_name=...
+    /search/length_range?min_length=...&max_length=...
+        Optional: limit, after (the next_cursor of the previous page).
+    /stats/top?limit=5
+    /stats/last?limit=5
+    /stats/by_type?query_type=...&limit=5
+    /stats/counts
+    /health
+
+The blocking MySQL and MongoDB calls run on a thread pool. Separate semaphores
+bound how many of them run at once, and every request has a timeout. On SIGINT
+or SIGTERM the server stops accepting connections, lets in-flight requests
+finish and flushes the pending query logs.
+
+The data access is a backend object: DatabaseBackend talks to MySQL and MongoDB,
+and StandInBackend serves a small in-memory catalog, so the service can be run
+and tested locally without any database.
+
+Usage:
+    python search_service.py --port 8080
+    python search_service.py --port 8080 --stand-in
+'''
+
+import argparse
+import asyncio
+import functools
+import json
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+import settings
+import mysql_connector
+import catalog_watch
+import slow_query_log
+import errors
+
+INT_PARAMS = {'year_from', 'year_to', 'min_length', 'max_length'}
+
+SEARCH_PARAMS = {
+    'keyword': ('keyword',),
+    'genre_year': ('genre', 'year_from', 'year_to'),
+    'actor_name': ('first_name', 'last_name'),
+    'length_range': ('min_length', 'max_length'),
+}
+
+
+class DatabaseBackend:
+    '''
+    Backend on top of mysql_connector (through a connection pool), log_stats and log_writer.
+    All methods are blocking; the service calls them from worker threads.
+    '''
+
+    def __init__(self, pool=None):
+        self.pool = pool or settings.get_mysql_pool()
+        warning = mysql_connector.select_film_source(self.pool)
+        if warning:
+            print(warning)
+        catalog_watch.start_background(self.pool)
+
+    def search(self, query_type: str, params: dict, after, limit: int) -> list[dict]:
+        return mysql_connector.run_search(self.pool, query_type, params, after, limit)
+
+    def log_query(self, query_type: str, params: dict) -> None:
+        import log_writer
+        log_writer.log_query(query_type, params)
+
+    def top_queries(self, limit: int) -> list:
+        import log_stats
+        return log_stats.get_top_queries(limit)
+
+    def last_queries(self, limit: int) -> list[dict]:
+        import log_stats
+        return log_stats.get_last_queries(limit)
+
+    def queries_by_type(self, query_type: str, limit: int) -> list[dict]:
+        import log_stats
+        return log_stats.get_queries_by_type(query_type, limit)
+
+    def query_counts(self) -> dict:
+        import log_stats
+        return log_stats.get_query_counts()
+
+    def close(self) -> None:
+        import log_writer
+        catalog_watch.stop()
+        log_writer.shutdown()
+        slow_query_log.shutdown(timeout=2)
+        settings.close_mysql_pool()
+        settings.close_mongo_client()
+
+
+class StandInBackend:
+    '''
+    In-memory stand-in for MySQL and MongoDB with the same search and paging semantics.
+    Args:
+        films (list of dict, optional): Catalog rows; a small sample is used by default.
+    '''
+
+    SAMPLE_FILMS = [
+        {'film_id': 1, 'title': 'ACADEMY DINOSAUR', 'description': 'A Epic Drama of a Feminist',
+         'release_year': 2006, 'length': 86, 'rating': 'PG', 'category': 'Documentary',
+         'actors': 'PENELOPE GUINESS, CHRISTIAN GABLE'},
+        {'film_id': 2, 'title': 'ACE GOLDFINGER', 'description': 'A Astounding Epistle of a Database',
+         'release_year': 2006, 'length': 48, 'rating': 'G', 'category': 'Horror',
+         'actors': 'BOB FAWCETT, MINNIE ZELLWEGER'},
+        {'film_id': 3, 'title': 'ADAPTATION HOLES', 'description': 'A Astounding Reflection of a Lumberjack',
+         'release_year': 2006, 'length': 50, 'rating': 'NC-17', 'category': 'Documentary',
+         'actors': 'NICK WAHLBERG, BOB FAWCETT'},
+        {'film_id': 4, 'title': 'AFFAIR PREJUDICE', 'description': 'A Fanciful Documentary of a Frisbee',
+         'release_year': 2006, 'length': 117, 'rating': 'G', 'category': 'Horror',
+         'actors': 'JODIE DEGENERES, SCARLETT DAMON'},
+        {'film_id': 5, 'title': 'AFRICAN EGG', 'description': 'A Fast-Paced Documentary of a Pastry Chef',
+         'release_year': 2006, 'length': 130, 'rating': 'G', 'category': 'Family',
+         'actors': 'GARY PHOENIX, DUSTIN TAUTOU'},
+    ]
+
+    def __init__(self, films: list[dict] = None):
+        self.films = films if films is not None else list(self.SAMPLE_FILMS)
+        self.logs = []
+
+    def _matches(self, film: dict, query_type: str, params: dict) -> bool:
+        if query_type == 'keyword':
+            return (params.get('keyword') or '').lower() in film['title'].lower()
+        if query_type == 'genre_year':
+            return (film['category'].lower() == (params.get('genre') or '').lower()
+                    and params['year_from'] <= film['release_year'] <= params['year_to'])
+        if query_type == 'actor_name':
+            first = (params.get('first_name') or '').lower()
+            last = (params.get('last_name') or '').lower()
+            for actor in film['actors'].lower().split(', '):
+                actor_first, _, actor_last = actor.partition(' ')
+                if actor_first.startswith(first) and actor_last.startswith(last):
+                    return True
+            return False
+        if query_type == 'length_range':
+            return params['min_length'] <= film['length'] <= params['max_length']
+        raise ValueError(f'Unknown query type: {query_type}')
+
+    def search(self, query_type: str, params: dict, after, limit: int) -> list[dict]:
+        sort_key = mysql_connector.SORT_KEYS[query_type]
+        rows = sorted(
+            (film for film in self.films if self._matches(film, query_type, params)),
+            key=lambda film: (film[sort_key], film['film_id'])
+        )
+        if after is not None:
+            rows = [film for film in rows if (film[sort_key], film['film_id']) > tuple(after)]
+        return rows[:limit]
+
+    def log_query(self, query_type: str, params: dict) -> None:
+        self.logs.append({
+            '_id': len(self.logs) + 1,
+            'query_type': query_type,
+            'params': dict(params),
+            'timestamp': datetime.now(timezone.utc),
+        })
+
+    def top_queries(self, limit: int) -> list:
+        counts = {}
+        for log in self.logs:
+            for key, value in log['params'].items():
+                if value not in (None, ''):
+                    item = f"{log['query_type']}.{key}:{value}".lower()
+                    counts[item] = counts.get(item, 0) + 1
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def last_queries(self, limit: int) -> list[dict]:
+        return list(reversed(self.logs))[:limit]
+
+    def queries_by_type(self, query_type: str, limit: int) -> list[dict]:
+        unique = {}
+        for log in reversed(self.logs):
+            if log['query_type'] != query_type:
+                continue
+            key = tuple(sorted((k, v) for k, v in log['params'].items() if v not in (None, '')))
+            if key in unique:
+                unique[key]['count'] += 1
+            else:
+                unique[key] = dict(log, count=1)
+        return list(unique.values())[:limit]
+
+    def query_counts(self) -> dict:
+        counts = {query_type: 0 for query_type in SEARCH_PARAMS}
+        for log in self.logs:
+            counts[log['query_type']] = counts.get(log['query_type'], 0) + 1
+        return counts
+
+    def close(self) -> None:
+        pass
+
+
+class HTTPError(Exception):
+    '''Error that is reported to the client with the given HTTP status.'''
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class SearchService:
+    '''
+    The HTTP service.
+    Args:
+        backend: DatabaseBackend, StandInBackend or any object with the same methods.
+        mysql_concurrency (int): Maximum concurrent search calls.
+        mongo_concurrency (int): Maximum concurrent statistics calls.
+        request_timeout (float): Seconds before a request fails with 504.
+    '''
+
+    def __init__(self, backend, mysql_concurrency: int = settings.SERVICE_MYSQL_CONCURRENCY,
+                 mongo_concurrency: int = settings.SERVICE_MONGO_CONCURRENCY,
+                 request_timeout: float = settings.SERVICE_REQUEST_TIMEOUT):
+        self.backend = backend
+        self.request_timeout = request_timeout
+        self._mysql = asyncio.Semaphore(mysql_concurrency)
+        self._mongo = asyncio.Semaphore(mongo_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=mysql_concurrency + mongo_concurrency, thread_name_prefix='search-service'
+        )
+        self._server = None
+        self._requests = set()
+
+    async def _call(self, semaphore: asyncio.Semaphore, func, *args):
+        '''
+        Runs a blocking backend call on the thread pool under a concurrency limit.
+        The slot is released when the thread finishes, even if the request timed out.
+        '''
+
+        await semaphore.acquire()
+        future = asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(func, *args)
+        )
+        future.add_done_callback(lambda _: semaphore.release())
+        return await asyncio.shield(future)
+
+    @staticmethod
+    def _int(query: dict, name: str, default: int = None) -> int:
+        value = query.get(name, default)
+        if value is None:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f'Missing parameter: {name}')
+        try:
+            return int(value)
+        except (TypeError, ValueError) as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f'Parameter {name} must be an integer') from e
+
+    @classmethod
+    def _limit(cls, query: dict, default: int, maximum: int = None) -> int:
+        limit = cls._int(query, 'limit', default)
+        if limit < 1:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'Parameter limit must be at least 1')
+        return min(limit, maximum) if maximum else limit
+
+    async def search(self, query_type: str, query: dict) -> dict:
+        '''Handles /search/<query_type>.'''
+
+        params = {}
+        for name in SEARCH_PARAMS[query_type]:
+            if name in INT_PARAMS:
+                params[name] = self._int(query, name)
+            else:
+                params[name] = query.get(name, '')
+        limit = self._limit(query, mysql_connector.PAGE_SIZE, 100)
+        try:
+            after = mysql_connector.decode_cursor(query.get('after'))
+        except ValueError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e)) from e
+
+        results = await self._call(self._mysql, self.backend.search, query_type, params, after, limit)
+        # Off the event loop: the first call starts the log writer, and a full
+        # queue makes put() wait up to LOG_ENQUEUE_TIMEOUT.
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.backend.log_query, query_type, params
+        )
+
+        next_cursor = None
+        if len(results) >= limit:
+            next_cursor = mysql_connector.encode_cursor(
+                mysql_connector.next_cursor(results, mysql_connector.SORT_KEYS[query_type])
+            )
+        return {'query_type': query_type, 'params': params, 'results': results,
+                'next_cursor': next_cursor}
+
+    async def stats(self, name: str, query: dict) -> dict:
+        '''Handles /stats/<name>.'''
+
+        limit = self._limit(query, 5)
+        if name == 'top':
+            top = await self._call(self._mongo, self.backend.top_queries, limit)
+            return {'top': [{'item': item, 'count': count} for item, count in top]}
+        if name == 'last':
+            return {'queries': await self._call(self._mongo, self.backend.last_queries, limit)}
+        if name == 'by_type':
+            query_type = query.get('query_type')
+            if not query_type:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, 'Missing parameter: query_type')
+            return {'queries': await self._call(self._mongo, self.backend.queries_by_type,
+                                                query_type, limit)}
+        if name == 'counts':
+            return {'counts': await self._call(self._mongo, self.backend.query_counts)}
+        raise HTTPError(HTTPStatus.NOT_FOUND, f'Unknown statistics view: {name}')
+
+    async def route(self, method: str, target: str) -> dict:
+        '''Dispatches one request to its handler and returns the JSON payload.'''
+
+        if method != 'GET':
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, 'Only GET is supported')
+
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split('/') if part]
+
+        if parts == ['health']:
+            return {'status': 'ok'}
+        if len(parts) == 2 and parts[0] == 'search' and parts[1] in SEARCH_PARAMS:
+            return await self.search(parts[1], query)
+        if len(parts) == 2 and parts[0] == 'stats':
+            return await self.stats(parts[1], query)
+        raise HTTPError(HTTPStatus.NOT_FOUND, f'Not found: {url.path}')
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        '''Serves one HTTP request per connection.'''
+
+        task = asyncio.current_task()
+        self._requests.add(task)
+        try:
+            status, payload = HTTPStatus.OK, None
+            try:
+                request_line = (await reader.readline()).decode('latin-1').split()
+                while (await reader.readline()).strip():
+                    pass
+                if len(request_line) != 3:
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, 'Malformed request line')
+                payload = await asyncio.wait_for(
+                    self.route(request_line[0], request_line[1]), self.request_timeout
+                )
+            except HTTPError as e:
+                status, payload = e.status, {'error': str(e)}
+            except asyncio.TimeoutError:
+                status, payload = HTTPStatus.GATEWAY_TIMEOUT, {'error': 'Request timed out'}
+            except Exception as e:
+                errors.log_error_to_file(f'Search service error: {e}')
+                status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)}
+
+            body = json.dumps(payload, default=str, ensure_ascii=False).encode('utf-8')
+            writer.write(
+                f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+                'Content-Type: application/json; charset=utf-8\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                'Connection: close\r\n\r\n'.encode('latin-1') + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            self._requests.discard(task)
+
+    async def start(self, host: str, port: int) -> None:
+        '''Starts listening for connections.'''
+
+        self._server = await asyncio.start_server(self.handle_connection, host, port)
+
+    @property
+    def port(self) -> int:
+        '''Port the service listens on (useful when started on port 0).'''
+
+        return self._server.sockets[0].getsockname()[1]
+
+    async def shutdown(self, grace: float = 10.0) -> None:
+        '''
+        Stops accepting connections, waits up to `grace` seconds for in-flight requests,
+        then closes the backend (which flushes pending query logs).
+        '''
+
+        if self._server is not None:
+            self._server.close()
+        if self._requests:
+            await asyncio.wait(set(self._requests), timeout=grace)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.backend.close)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def serve(service: SearchService, host: str, port: int) -> None:
+    '''Runs the service until SIGINT or SIGTERM, then shuts it down gracefully.'''
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(stop.set))
+
+    await service.start(host, port)
+    print(f'Search service listening on http://{host}:{service.port}')
+    await stop.wait()
+    print('Shutting down...')
+    await service.shutdown()
+
+
+def main() -> None:
+    '''Command-line entry point of the search service.'''
+
+    parser = argparse.ArgumentParser(description='Film search and statistics HTTP service.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--stand-in', action='store_true',
+                        help='serve an in-memory sample catalog instead of MySQL/MongoDB')
+    args = parser.parse_args()
+
+    backend = StandInBackend() if args.stand_in else DatabaseBackend()
+    asyncio.run(serve(SearchService(backend), args.host, args.port))
+
+
+if __name__ == '__main__':
+    main()
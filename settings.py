@@ -1,14 +1,17 @@
 '''
 Module for database connection settings and connection helpers
 for MySQL and MongoDB.
+Clients are created lazily on first use: importing settings neither imports
+pymongo nor opens any connection.
 '''
 
 import os
+import threading
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from pymysql.err import MySQLError
-from pymongo.errors import PyMongoError
 import pymysql
-import pymongo
 
 load_dotenv()
 
@@ -23,10 +26,102 @@ DATABASE_MYSQL_W = {
 
 DATABASE_MYSQL_NAME = os.getenv('MYSQL_DATABASE')
 
-MONGO_CLIENT = pymongo.MongoClient(os.getenv('MONGO_URI'))
+# Table or view the film searches read from: the materialized film_extended table
+# (see create_table_film_extended.sql) or the original film_extended_view. Until
+# film_extended has been refreshed once, mysql_connector.select_film_source falls
+# back to the view.
+FILM_SOURCE = os.getenv('MYSQL_FILM_SOURCE', 'film_extended')
 
-DATABASE_MONGO = MONGO_CLIENT[os.getenv('MONGO_DB')]
-MY_COLLECTION_MONGO = DATABASE_MONGO[os.getenv('MONGO_COLLECTION')]
+# MySQL connection pool (see MySQLPool).
+MYSQL_POOL_MIN_SIZE = int(os.getenv('MYSQL_POOL_MIN_SIZE', '1'))
+MYSQL_POOL_MAX_SIZE = int(os.getenv('MYSQL_POOL_MAX_SIZE', '8'))
+MYSQL_POOL_MAX_LIFETIME = float(os.getenv('MYSQL_POOL_MAX_LIFETIME', '3600'))
+MYSQL_POOL_CHECKOUT_TIMEOUT = float(os.getenv('MYSQL_POOL_CHECKOUT_TIMEOUT', '30'))
+
+# Write-behind buffer for query logs (see log_writer.QueryLogWriter).
+LOG_BATCH_SIZE = int(os.getenv('LOG_BATCH_SIZE', '100'))
+LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', '1.0'))
+LOG_QUEUE_MAXSIZE = int(os.getenv('LOG_QUEUE_MAXSIZE', '10000'))
+LOG_ENQUEUE_TIMEOUT = float(os.getenv('LOG_ENQUEUE_TIMEOUT', '0.05'))
+
+# Local disk spool the query logs pass through on their way to MongoDB (see log_spool).
+SPOOL_ENABLED = os.getenv('SPOOL_ENABLED', '1') == '1'
+SPOOL_DIR = os.getenv('SPOOL_DIR', 'log_spool')
+SPOOL_SEGMENT_BYTES = int(os.getenv('SPOOL_SEGMENT_BYTES', str(1024 * 1024)))
+SPOOL_FSYNC = os.getenv('SPOOL_FSYNC', '1') == '1'
+SPOOL_STALE_AFTER = float(os.getenv('SPOOL_STALE_AFTER', '60'))
+SPOOL_REPLAY_INTERVAL = float(os.getenv('SPOOL_REPLAY_INTERVAL', '1.0'))
+SPOOL_REPLAY_BATCH = int(os.getenv('SPOOL_REPLAY_BATCH', '1000'))
+SPOOL_MAX_BACKOFF = float(os.getenv('SPOOL_MAX_BACKOFF', '60'))
+SPOOL_MAX_ATTEMPTS = int(os.getenv('SPOOL_MAX_ATTEMPTS', '5'))
+SPOOL_SHUTDOWN_TIMEOUT = float(os.getenv('SPOOL_SHUTDOWN_TIMEOUT', '5'))
+
+# Days raw query logs are kept (TTL index, see log_indexes); 0 keeps them forever.
+LOG_RETENTION_DAYS = float(os.getenv('LOG_RETENTION_DAYS', '0'))
+
+# Answer keyword searches from the in-process trigram index (see title_index),
+# rebuilt from MySQL every TITLE_INDEX_TTL seconds.
+TITLE_INDEX_ENABLED = os.getenv('TITLE_INDEX_ENABLED', '0') == '1'
+TITLE_INDEX_TTL = float(os.getenv('TITLE_INDEX_TTL', '300'))
+
+# LRU + TTL cache of search results (see result_cache).
+RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', '1') == '1'
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '1000'))
+RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', '300'))
+
+# Result cache warm-up from the most popular logged searches (see cache_warmup).
+# WARMUP_INTERVAL = 0 runs it once at start-up, otherwise every N seconds.
+WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', '1') == '1'
+WARMUP_INTERVAL = float(os.getenv('WARMUP_INTERVAL', '0'))
+WARMUP_MAX_QUERIES = int(os.getenv('WARMUP_MAX_QUERIES', '50'))
+WARMUP_TIME_BUDGET = float(os.getenv('WARMUP_TIME_BUDGET', '10'))
+WARMUP_MEMORY_BUDGET = int(os.getenv('WARMUP_MEMORY_BUDGET', str(8 * 1024 * 1024)))
+WARMUP_LOOKBACK_DAYS = float(os.getenv('WARMUP_LOOKBACK_DAYS', '7'))
+
+# HTTP search service limits (see search_service).
+SERVICE_MYSQL_CONCURRENCY = int(os.getenv('SERVICE_MYSQL_CONCURRENCY', str(MYSQL_POOL_MAX_SIZE)))
+SERVICE_MONGO_CONCURRENCY = int(os.getenv('SERVICE_MONGO_CONCURRENCY', '4'))
+SERVICE_REQUEST_TIMEOUT = float(os.getenv('SERVICE_REQUEST_TIMEOUT', '10'))
+
+# Threads running the blocking calls behind async_db coroutines.
+ASYNC_DB_WORKERS = int(os.getenv('ASYNC_DB_WORKERS', str(MYSQL_POOL_MAX_SIZE + 4)))
+
+# Seconds the genre/year/length metadata stays cached (see catalog_cache).
+CATALOG_CACHE_TTL = float(os.getenv('CATALOG_CACHE_TTL', '3600'))
+
+# Seconds between checks of the film_extended refresh watermark (see catalog_watch);
+# 0 disables the check.
+CATALOG_WATCH_INTERVAL = float(os.getenv('CATALOG_WATCH_INTERVAL', '30'))
+
+# Latency and round-trip metrics (see metrics). METRICS_PORT = 0 disables the
+# HTTP endpoint, an empty METRICS_FILE the file export.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '0') == '1'
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_FILE = os.getenv('METRICS_FILE', '')
+METRICS_FILE_INTERVAL = float(os.getenv('METRICS_FILE_INTERVAL', '15'))
+
+# Slow query log of mysql_connector (see slow_query_log). Executions slower than
+# SLOW_QUERY_THRESHOLD seconds are always logged, faster ones with probability
+# SLOW_QUERY_SAMPLE_RATE.
+SLOW_QUERY_ENABLED = os.getenv('SLOW_QUERY_ENABLED', '1') == '1'
+SLOW_QUERY_THRESHOLD = float(os.getenv('SLOW_QUERY_THRESHOLD', '0.2'))
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv('SLOW_QUERY_SAMPLE_RATE', '0'))
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', '1') == '1'
+SLOW_QUERY_LOG_FILE = os.getenv('SLOW_QUERY_LOG_FILE', 'slow_queries.log')
+SLOW_QUERY_QUEUE_MAXSIZE = int(os.getenv('SLOW_QUERY_QUEUE_MAXSIZE', '1000'))
+
+MONGO_URI = os.getenv('MONGO_URI')
+MONGO_DB_NAME = os.getenv('MONGO_DB')
+MONGO_COLLECTION_NAME = os.getenv('MONGO_COLLECTION')
+MONGO_ROLLUP_COLLECTION_NAME = os.getenv(
+    'MONGO_ROLLUP_COLLECTION', f'{MONGO_COLLECTION_NAME}_rollup'
+)
+
+_mongo_client = None
+_mongo_lock = threading.Lock()
+_mysql_pool = None
+_mysql_pool_lock = threading.Lock()
 
 
 def create_mysql_connection():
@@ -42,12 +137,260 @@ def create_mysql_connection():
         raise MySQLError(f'Error connecting to MySQL: {e}') from e
 
 
+class MySQLPool:
+    '''
+    Thread-safe pool of MySQL connections.
+    Keeps between min_size and max_size connections; the first min_size are opened
+    on the first checkout, not when the pool is created. On checkout a connection is
+    pinged (and reconnected if the server dropped it) and replaced once it is
+    older than max_lifetime seconds. On return its transaction is rolled back so
+    the next user starts from a fresh snapshot.
+    Use it through the context manager:
+        with pool.connection() as conn:
+            ...
+    '''
+
+    def __init__(self, min_size: int = MYSQL_POOL_MIN_SIZE, max_size: int = MYSQL_POOL_MAX_SIZE,
+                 max_lifetime: float = MYSQL_POOL_MAX_LIFETIME,
+                 checkout_timeout: float = MYSQL_POOL_CHECKOUT_TIMEOUT):
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.max_lifetime = max_lifetime
+        self.checkout_timeout = checkout_timeout
+        self._cond = threading.Condition()
+        self._idle = []
+        self._born = {}
+        self._size = 0
+        self._closed = False
+        self._metrics = {
+            'created': 0,
+            'recycled': 0,
+            'ping_failures': 0,
+            'checkouts': 0,
+            'in_use': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+        self._warmed = False
+
+    def _warm(self) -> None:
+        with self._cond:
+            if self._warmed:
+                return
+            self._warmed = True
+        while True:
+            # One slot at a time: a failed connect gives back only its own slot.
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._open()
+            except MySQLError:
+                with self._cond:
+                    self._warmed = False
+                raise
+            with self._cond:
+                self._idle.append(conn)
+                self._cond.notify()
+
+    def _open(self):
+        try:
+            conn = create_mysql_connection()
+        except MySQLError:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._born[conn] = time.monotonic()
+            self._metrics['created'] += 1
+        return conn
+
+    def _discard(self, conn) -> None:
+        with self._cond:
+            self._born.pop(conn, None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        '''
+        Checks a healthy connection out of the pool, waiting if all are in use.
+        Raises:
+            MySQLError: If the pool is closed or no connection frees up in time.
+        '''
+
+        if not self._warmed:
+            self._warm()
+
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise MySQLError('MySQL connection pool is closed')
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    raise MySQLError('Timed out waiting for a pooled MySQL connection')
+
+        if conn is None:
+            conn = self._open()
+        elif time.monotonic() - self._born.get(conn, 0.0) > self.max_lifetime:
+            self._discard(conn)
+            with self._cond:
+                self._metrics['recycled'] += 1
+            conn = self._open()
+        else:
+            try:
+                conn.ping(reconnect=True)
+            except MySQLError:
+                with self._cond:
+                    self._metrics['ping_failures'] += 1
+                self._discard(conn)
+                conn = self._open()
+
+        waited = time.monotonic() - started
+        with self._cond:
+            self._metrics['checkouts'] += 1
+            self._metrics['in_use'] += 1
+            self._metrics['wait_time_total'] += waited
+            self._metrics['wait_time_max'] = max(self._metrics['wait_time_max'], waited)
+        return conn
+
+    def release(self, conn) -> None:
+        '''Returns a connection obtained from acquire() to the pool.'''
+
+        try:
+            conn.rollback()
+            healthy = True
+        except Exception:
+            healthy = False
+            self._discard(conn)
+
+        with self._cond:
+            self._metrics['in_use'] -= 1
+            if healthy and not self._closed:
+                self._idle.append(conn)
+            else:
+                self._size -= 1
+                if healthy:
+                    self._born.pop(conn, None)
+                    conn.close()
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        '''Context manager that checks a connection out and always returns it.'''
+
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> dict:
+        '''Returns pool metrics: sizes, checkouts, created/recycled connections and wait times.'''
+
+        with self._cond:
+            return dict(self._metrics, size=self._size, idle=len(self._idle))
+
+    def close(self) -> None:
+        '''Closes idle connections; connections still in use are closed when returned.'''
+
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+
+def create_mysql_pool(**kwargs) -> MySQLPool:
+    '''
+    Creates a MySQL connection pool sized by the MYSQL_POOL_* settings.
+    Keyword arguments override the MySQLPool defaults.
+    '''
+
+    return MySQLPool(**kwargs)
+
+
+def get_mysql_pool() -> MySQLPool:
+    '''
+    Returns the shared MySQL connection pool, creating it on first use.
+    No connection is opened until the first checkout.
+    '''
+
+    global _mysql_pool
+    with _mysql_pool_lock:
+        if _mysql_pool is None:
+            _mysql_pool = create_mysql_pool()
+        return _mysql_pool
+
+
+def close_mysql_pool() -> None:
+    '''Closes the shared MySQL connection pool if it was ever created.'''
+
+    global _mysql_pool
+    with _mysql_pool_lock:
+        pool, _mysql_pool = _mysql_pool, None
+    if pool is not None:
+        pool.close()
+
+
+def get_mongo_client():
+    '''
+    Returns the shared MongoDB client, importing pymongo and creating it on first use.
+    '''
+
+    global _mongo_client
+    if _mongo_client is None:
+        with _mongo_lock:
+            if _mongo_client is None:
+                import pymongo
+                _mongo_client = pymongo.MongoClient(MONGO_URI)
+    return _mongo_client
+
+
+def close_mongo_client() -> None:
+    '''Closes the shared MongoDB client if it was ever created.'''
+
+    global _mongo_client
+    with _mongo_lock:
+        client, _mongo_client = _mongo_client, None
+    if client is not None:
+        client.close()
+
+
 def get_mongo_collection():
     '''
     Returns a connection to the fixed MongoDB collection.
     '''
 
+    from pymongo.errors import PyMongoError
+    try:
+        return get_mongo_client()[MONGO_DB_NAME][MONGO_COLLECTION_NAME]
+    except PyMongoError as e:
+        raise PyMongoError(f'Error connecting to MongoDB Collection: {e}') from e
+
+
+def get_rollup_collection():
+    '''
+    Returns the MongoDB collection holding pre-aggregated query log statistics.
+    '''
+
+    from pymongo.errors import PyMongoError
     try:
-        return MY_COLLECTION_MONGO
+        return get_mongo_client()[MONGO_DB_NAME][MONGO_ROLLUP_COLLECTION_NAME]
     except PyMongoError as e:
         raise PyMongoError(f'Error connecting to MongoDB Collection: {e}') from e
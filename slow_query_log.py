@@ -0,0 +1,226 @@
+'''
+The slow_query_log module records slow MySQL queries of mysql_connector.
+
+Every statement executed through mysql_connector._cursor is timed. Executions
+slower than SLOW_QUERY_THRESHOLD seconds, plus a random SLOW_QUERY_SAMPLE_RATE
+fraction of the fast ones (a full scan can be fast on a small table and still
+matter in production), are appended as JSON lines to SLOW_QUERY_LOG_FILE with the
+SQL text, bound parameters, duration and row count.
+
+The EXPLAIN FORMAT=JSON plan of each recorded SELECT is captured on a background
+thread over its own pool connection, so the search that triggered it never waits;
+tables read with a full scan are listed in 'full_scans'. Records are dropped
+rather than blocking when the background queue is full.
+
+Usage (summary of the recorded statements):
+    python slow_query_log.py [--file slow_queries.log] [--top 10]
+'''
+
+import argparse
+import json
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+import settings
+import errors
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+class SlowQueryRecorder:
+    '''
+    Background writer of slow query records.
+    A daemon thread drains a bounded queue, captures the EXPLAIN plan of each
+    SELECT (if enabled) and appends the record to the log file.
+    '''
+
+    def __init__(self, path: str = settings.SLOW_QUERY_LOG_FILE,
+                 explain: bool = settings.SLOW_QUERY_EXPLAIN,
+                 max_queue: int = settings.SLOW_QUERY_QUEUE_MAXSIZE):
+        self.path = path
+        self.explain = explain
+        self.recorded = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name='slow-query-log', daemon=True)
+        self._thread.start()
+
+    def put(self, record: dict) -> None:
+        '''Queues a record without waiting; drops it when the queue is full.'''
+
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def shutdown(self, timeout: float = None) -> None:
+        '''Writes the queued records and stops the background thread.'''
+
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            record = self._queue.get()
+            if record is None:
+                return
+            try:
+                if self.explain and is_explainable(record['sql']):
+                    record['plan'] = explain(record['sql'], record['params'])
+                    record['full_scans'] = full_scans(record['plan'])
+            except Exception as e:
+                record['plan_error'] = str(e)
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, default=str) + '\n')
+                self.recorded += 1
+            except OSError as e:
+                errors.log_error_to_file(f'Slow query log write failed: {e}')
+
+
+def is_explainable(sql: str) -> bool:
+    '''Returns True for statements EXPLAIN accepts without side effects.'''
+
+    return sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+
+
+def explain(sql: str, params) -> dict:
+    '''
+    Runs EXPLAIN FORMAT=JSON for a statement on a pooled connection.
+    Returns:
+        dict: The parsed query plan.
+    '''
+
+    with settings.get_mysql_pool().connection() as conn, conn.cursor() as cursor:
+        cursor.execute(f'EXPLAIN FORMAT=JSON {sql}', params)
+        row = cursor.fetchone()
+    return json.loads(next(iter(row.values())) if isinstance(row, dict) else row[0])
+
+
+def full_scans(plan) -> list[str]:
+    '''Lists the tables an EXPLAIN FORMAT=JSON plan reads with access_type ALL.'''
+
+    tables = []
+    if isinstance(plan, dict):
+        if plan.get('access_type') == 'ALL' and 'table_name' in plan:
+            tables.append(plan['table_name'])
+        for value in plan.values():
+            tables.extend(full_scans(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            tables.extend(full_scans(value))
+    return tables
+
+
+def get_recorder() -> SlowQueryRecorder:
+    '''Returns the shared SlowQueryRecorder, starting it on first use.'''
+
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = SlowQueryRecorder()
+        return _recorder
+
+
+def record(sql: str, params, duration: float, rows: int = None) -> None:
+    '''Queues one execution for the slow query log; rows is None when unknown.'''
+
+    get_recorder().put({
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'sql': sql,
+        'params': list(params) if isinstance(params, (list, tuple)) else params,
+        'duration_ms': round(duration * 1000, 3),
+        'rows': rows,
+        'sampled': duration < settings.SLOW_QUERY_THRESHOLD,
+    })
+
+
+class _TimedCursor:
+    '''Cursor proxy timing execute() and recording slow or sampled executions.'''
+
+    def __init__(self, cursor, unbuffered: bool = False):
+        self._cursor = cursor
+        self._unbuffered = unbuffered
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        result = self._cursor.execute(query, args)
+        duration = time.perf_counter() - started
+        if (duration >= settings.SLOW_QUERY_THRESHOLD
+                or random.random() < settings.SLOW_QUERY_SAMPLE_RATE):
+            # An unbuffered cursor has not read its rows yet, so its rowcount means nothing.
+            record(query, args, duration, None if self._unbuffered else self._cursor.rowcount)
+        return result
+
+
+def track_cursor(cursor, unbuffered: bool = False):
+    '''
+    Wraps a DB-API cursor so slow executions are recorded; returns it unchanged when disabled.
+    Pass unbuffered=True for server-side cursors: their row count is not logged.
+    '''
+
+    if not settings.SLOW_QUERY_ENABLED:
+        return cursor
+    return _TimedCursor(cursor, unbuffered)
+
+
+def shutdown(timeout: float = None) -> None:
+    '''Writes queued records and stops the background recorder.'''
+
+    global _recorder
+    with _recorder_lock:
+        recorder, _recorder = _recorder, None
+    if recorder is not None:
+        recorder.shutdown(timeout)
+
+
+def summarize(path: str, top: int = 10) -> list[dict]:
+    '''
+    Groups the recorded executions by SQL text.
+    Returns:
+        list[dict]: The `top` statements by total duration, with their count,
+                    total and maximum duration and the tables scanned in full.
+    '''
+
+    statements = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            entry = json.loads(line)
+            stats = statements.setdefault(entry['sql'], {
+                'sql': entry['sql'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                'full_scans': set(),
+            })
+            stats['count'] += 1
+            stats['total_ms'] += entry['duration_ms']
+            stats['max_ms'] = max(stats['max_ms'], entry['duration_ms'])
+            stats['full_scans'].update(entry.get('full_scans', []))
+
+    ranked = sorted(statements.values(), key=lambda s: s['total_ms'], reverse=True)[:top]
+    for stats in ranked:
+        stats['full_scans'] = sorted(stats['full_scans'])
+    return ranked
+
+
+def main() -> None:
+    '''Prints the statements with the highest total duration in the slow query log.'''
+
+    parser = argparse.ArgumentParser(description='Summarize the slow query log.')
+    parser.add_argument('--file', default=settings.SLOW_QUERY_LOG_FILE)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    for stats in summarize(args.file, args.top):
+        scans = ', '.join(stats['full_scans']) or '-'
+        print(f'{stats["count"]:6d} x  total {stats["total_ms"]:10.1f} ms  '
+              f'max {stats["max_ms"]:8.1f} ms  full scans: {scans}')
+        print(f'         {stats["sql"]}\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+'''
+Module startup_profile measures the cold-start time of main.py.
+
+It imports main in a fresh interpreter with `python -X importtime`, then reports
+the total wall time and the slowest imports by cumulative and self time.
+The report can also be saved as JSON to track start-up time between releases.
+
+Usage:
+    python startup_profile.py [--top 15] [--runs 3] [--json startup.json]
+'''
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent
+
+
+def profile_once() -> tuple[float, list[dict]]:
+    '''
+    Imports main in a new interpreter and collects -X importtime output.
+    Returns:
+        tuple: Wall time in seconds and a list of dicts with 'module',
+               'self_us' and 'cumulative_us' for every import.
+    '''
+
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+    )
+    wall_time = time.perf_counter() - started
+
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|', 2)
+        imports.append({
+            'module': module.strip(),
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us),
+        })
+    return wall_time, imports
+
+
+def build_report(runs: int = 3, top: int = 15) -> dict:
+    '''
+    Profiles the start-up `runs` times and keeps the fastest run.
+    Args:
+        runs (int): Number of fresh interpreter runs.
+        top (int): Number of slowest imports to keep in the report.
+    Returns:
+        dict: Report with wall time, total import time and the slowest imports.
+    '''
+
+    wall_time, imports = min((profile_once() for _ in range(runs)), key=lambda r: r[0])
+    return {
+        'python': sys.version.split()[0],
+        'wall_time_ms': round(wall_time * 1000, 1),
+        'import_time_ms': round(sum(i['self_us'] for i in imports) / 1000, 1),
+        'modules_imported': len(imports),
+        'top_cumulative': sorted(imports, key=lambda i: i['cumulative_us'], reverse=True)[:top],
+        'top_self': sorted(imports, key=lambda i: i['self_us'], reverse=True)[:top],
+    }
+
+
+def print_report(report: dict) -> None:
+    '''Prints a start-up report as formatted tables.'''
+
+    from tabulate import tabulate
+
+    print(f"Start-up of main.py (Python {report['python']}): "
+          f"{report['wall_time_ms']} ms wall, {report['import_time_ms']} ms in imports, "
+          f"{report['modules_imported']} modules")
+    for title, key in (('Slowest imports (cumulative)', 'top_cumulative'),
+                       ('Slowest imports (self)', 'top_self')):
+        rows = [[i['module'], i['cumulative_us'] / 1000, i['self_us'] / 1000] for i in report[key]]
+        print(f'\n{title}:')
+        print(tabulate(rows, headers=['Module', 'Cumulative ms', 'Self ms'],
+                       tablefmt='grid', floatfmt='.2f'))
+
+
+def main() -> None:
+    '''Command-line entry point of the start-up profiler.'''
+
+    parser = argparse.ArgumentParser(description='Profile the cold start of main.py.')
+    parser.add_argument('--runs', type=int, default=3, help='fresh interpreter runs (best is kept)')
+    parser.add_argument('--top', type=int, default=15, help='number of slowest imports to show')
+    parser.add_argument('--json', help='also write the report to this JSON file')
+    args = parser.parse_args()
+
+    report = build_report(args.runs, args.top)
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+'''
+The title_index module provides an optional in-process trigram index over film
+titles, so substring keyword searches do not have to scan film_extended with
+LIKE '%keyword%'.
+
+The index is built from a snapshot of (film_id, title) pairs and rebuilt once it
+is older than settings.TITLE_INDEX_TTL seconds, or when refresh() or invalidate()
+is called. A query intersects the posting lists
+of the keyword's trigrams (smallest first), verifies the remaining candidates
+with a real substring test and returns them in (title, film_id) order.
+'''
+
+import threading
+import time
+from collections import defaultdict
+import settings
+
+_lock = threading.Lock()
+_index = None
+_built_at = 0.0
+
+
+def trigrams(text: str) -> set[str]:
+    '''Returns the set of case-folded three-character substrings of text.'''
+
+    text = text.casefold()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TitleTrigramIndex:
+    '''
+    Trigram inverted index over a snapshot of film titles.
+    Args:
+        rows (iterable): Pairs (film_id, title).
+    '''
+
+    def __init__(self, rows):
+        self._titles = {}
+        self._postings = defaultdict(set)
+        for film_id, title in rows:
+            title = title or ''
+            self._titles[film_id] = title
+            for gram in trigrams(title):
+                self._postings[gram].add(film_id)
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    @staticmethod
+    def _sort_key(title: str, film_id) -> tuple:
+        return title.casefold(), film_id
+
+    def match(self, keyword: str) -> list[int]:
+        '''
+        Finds every film whose title contains keyword (case-insensitive).
+        Args:
+            keyword (str): Substring to look for.
+        Returns:
+            list[int]: Matching film_ids ordered by (title, film_id).
+        '''
+
+        needle = keyword.casefold()
+        grams = trigrams(needle)
+
+        if grams:
+            postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                if not candidates:
+                    break
+                candidates &= posting
+        else:
+            candidates = self._titles.keys()
+
+        matches = [fid for fid in candidates if needle in self._titles[fid].casefold()]
+        matches.sort(key=lambda fid: self._sort_key(self._titles[fid], fid))
+        return matches
+
+    def page(self, keyword: str, after=None, limit: int = 10) -> list[int]:
+        '''
+        Returns one page of matching film_ids with keyset pagination semantics.
+        Args:
+            keyword (str): Substring to look for.
+            after (tuple, optional): Cursor token (title, film_id) of the previous page.
+            limit (int): Page size.
+        Returns:
+            list[int]: Up to `limit` film_ids ordered by (title, film_id).
+        '''
+
+        matches = self.match(keyword)
+        if after is not None:
+            cursor_key = self._sort_key(*after)
+            matches = [
+                fid for fid in matches
+                if self._sort_key(self._titles[fid], fid) > cursor_key
+            ]
+        return matches[:limit]
+
+
+def get_index(loader) -> TitleTrigramIndex:
+    '''
+    Returns the shared index, building it on first use or once it has expired.
+    Args:
+        loader (callable): Returns the (film_id, title) snapshot; called only when building.
+    '''
+
+    global _index, _built_at
+    with _lock:
+        if _index is None or time.monotonic() - _built_at > settings.TITLE_INDEX_TTL:
+            _index = TitleTrigramIndex(loader())
+            _built_at = time.monotonic()
+        return _index
+
+
+def refresh(loader) -> TitleTrigramIndex:
+    '''Rebuilds the shared index from a fresh snapshot.'''
+
+    global _index, _built_at
+    index = TitleTrigramIndex(loader())
+    with _lock:
+        _index = index
+        _built_at = time.monotonic()
+    return index
+
+
+def invalidate() -> None:
+    '''Drops the shared index; the next search rebuilds it.'''
+
+    global _index
+    with _lock:
+        _index = None
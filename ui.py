@@ -4,8 +4,11 @@ displaying menus, requesting input data, and showing results in the console.
 '''
 
 import mysql_connector
+import catalog_cache
+import result_cache
+import prefetch
 import log_writer
-import log_stats
+import metrics
 import display_utils
 import errors
 
@@ -47,7 +50,8 @@ def handle_search_menu(conn) -> None:
     print(f'{display_utils.colorize("1. By keyword", "blue")}')
     print(f'{display_utils.colorize("2. By genre and year range", "blue")}')
     print(f'{display_utils.colorize("3. By actor (first and last name)", "blue")}')
-    print(f'{display_utils.colorize("4. By film length", "blue")}\n')
+    print(f'{display_utils.colorize("4. By film length", "blue")}')
+    print(f'{display_utils.colorize("5. Combined filters", "blue")}\n')
 
     search_choice = input('Choose search method: ').strip()
 
@@ -63,6 +67,9 @@ def handle_search_menu(conn) -> None:
     elif search_choice == '4':
         handle_length_search(conn)
 
+    elif search_choice == '5':
+        handle_combined_search(conn)
+
     else:
         print('Invalid search method selection.')
 
@@ -72,44 +79,28 @@ def handle_keyword_search(conn) -> None:
     '''Prompts user for keyword and handles search by keyword with pagination.'''
 
     keyword = input('\nEnter a keyword to search in film titles: ').strip()
-    offset = 0
-    while True:
-        results = mysql_connector.search_by_keyword(conn, keyword, offset)
-        log_writer.log_query('keyword', {'keyword': keyword})
-        if handle_pagination(results, offset, display_utils.display_films_table):
-            offset += 10
-        else:
-            break
+    paginate_search(conn, 'keyword', {'keyword': keyword})
 
 
 @errors.log_error(display=True)
 def handle_actor_search(conn) -> None:
-    '''Prompts user for actor's first and last name, then handles search with pagination.'''
+    '''Prompts user for actor's first and last name prefixes, then handles search with pagination.'''
 
     print(f'{display_utils.colorize("\nEnter actor details for search (can be left empty):", "yellow")}\n')
     first_name = input(f'{display_utils.colorize("Actor first name: ", "blue")}').strip()
     last_name = input(f'{display_utils.colorize("Actor last name: ", "blue")}').strip()
 
-    name_part = f'{first_name} {last_name}'.strip() or first_name or last_name
-
-    offset = 0
-    while True:
-        results = mysql_connector.search_by_actor_name_partial(conn, name_part, offset)
-        log_writer.log_query('actor_name', {
-            'first_name': first_name,
-            'last_name': last_name
-        })
-        if handle_pagination(results, offset, display_utils.display_films_table):
-            offset += 10
-        else:
-            break
+    paginate_search(conn, 'actor_name', {
+        'first_name': first_name,
+        'last_name': last_name
+    })
 
 
 @errors.log_error(display=True)
 def handle_genre_year_search(conn) -> None:
     '''Prompts user for genre and year range, then handles search with pagination.'''
 
-    genres, min_year, max_year = mysql_connector.get_genres_and_year_range(conn)
+    genres, min_year, max_year = catalog_cache.get_genres_and_year_range(conn)
 
     print(f'{display_utils.colorize("\nGenres in the database:", "yellow")}\n')
     for g in genres:
@@ -139,27 +130,18 @@ def handle_genre_year_search(conn) -> None:
         except ValueError:
             print('Input error. Please enter valid years.')
 
-    offset = 0
-    while True:
-        results = mysql_connector.search_by_genre_and_years(
-            conn, genre, year_from, year_to, offset=offset
-        )
-        log_writer.log_query('genre_year', {
-            'genre': genre,
-            'year_from': year_from,
-            'year_to': year_to
-        })
-        if handle_pagination(results, offset, display_utils.display_films_table):
-            offset += 10
-        else:
-            break
+    paginate_search(conn, 'genre_year', {
+        'genre': genre,
+        'year_from': year_from,
+        'year_to': year_to
+    })
 
 
 @errors.log_error(display=True)
 def handle_length_search(conn) -> None:
     '''Handles search by movie length with pagination.'''
 
-    min_len_db, max_len_db = mysql_connector.get_length_range(conn)
+    min_len_db, max_len_db = catalog_cache.get_length_range(conn)
     print(display_utils.colorize(
         f'\nAvailable movie length range: from {min_len_db} to {max_len_db} minutes.',
         'yellow'
@@ -183,27 +165,103 @@ def handle_length_search(conn) -> None:
         except ValueError:
             print('\nInvalid input. Please enter valid integers.')
 
-    offset = 0
+    paginate_search(conn, 'length_range', {
+        'min_length': min_length,
+        'max_length': max_length
+    })
+
+
+def _input_optional_int(prompt: str):
+    '''Asks for a whole number until one is entered; returns None for an empty answer.'''
+
     while True:
-        results = mysql_connector.search_by_length_range(conn, min_length, max_length, offset)
-        log_writer.log_query('length_range', {
-            'min_length': min_length,
-            'max_length': max_length
-        })
-
-        if handle_pagination(results, offset, display_utils.display_films_table):
-            offset += 10
-        else:
+        value = input(prompt).strip()
+        if not value:
+            return None
+        if value.isdigit():
+            return int(value)
+        print('Please enter a whole number or leave empty.')
+
+
+@errors.log_error(display=True)
+def handle_combined_search(conn) -> None:
+    '''
+    Prompts for any combination of filters (each may be left empty), shows how many
+    films match with their breakdown by genre, rating, year and length, then the
+    results page by page.
+    '''
+
+    genres, _, _ = catalog_cache.get_genres_and_year_range(conn)
+
+    print(f'{display_utils.colorize("\nEnter filters (leave empty to skip):", "yellow")}\n')
+    keyword = input('Keyword in title: ').strip()
+    while True:
+        genre = input(f'Genre ({", ".join(genres)}): ').strip()
+        if not genre or genre in genres:
             break
+        print('\nInvalid genre. Please try again.')
+    rating = input('Rating (G, PG, PG-13, R, NC-17): ').strip().upper()
+    year_from = _input_optional_int('Release year from: ')
+    year_to = _input_optional_int('Release year to: ')
+    min_length = _input_optional_int('Minimum length (minutes): ')
+    max_length = _input_optional_int('Maximum length (minutes): ')
+    first_name = input('Actor first name: ').strip()
+    last_name = input('Actor last name: ').strip()
+
+    filters = {
+        'keyword': keyword, 'genre': genre, 'rating': rating,
+        'year_from': year_from, 'year_to': year_to,
+        'min_length': min_length, 'max_length': max_length,
+        'first_name': first_name, 'last_name': last_name,
+    }
+    with metrics.action('ui.combined.first_page'):
+        result = mysql_connector.faceted_search(conn, filters)
+    display_utils.display_facets(result['total'], result['facets'], {
+        'year': mysql_connector.YEAR_BUCKET,
+        'length': mysql_connector.LENGTH_BUCKET,
+    })
+    paginate_search(conn, 'combined', filters, first_page=result['films'])
+
+
+def paginate_search(conn, query_type: str, params: dict, first_page: list = None) -> None:
+    '''
+    Shows a search page by page, logging every page shown.
+    While the user reads a full page, the next one is prefetched in the background
+    (see prefetch.PagePrefetcher) and discarded if the user stops.
+    Loading each page is measured as a user action (see metrics.action).
+    first_page: Already loaded first page (e.g. from mysql_connector.faceted_search).
+    '''
+
+    sort_key = mysql_connector.SORT_KEYS[query_type]
+    prefetcher = prefetch.PagePrefetcher(conn, query_type, params)
+    try:
+        results = first_page
+        if results is None:
+            with metrics.action(f'ui.{query_type}.first_page'):
+                results = mysql_connector.run_search(conn, query_type, params)
+        while True:
+            log_writer.log_query(query_type, params)
+            if len(results) >= mysql_connector.PAGE_SIZE:
+                prefetcher.start(mysql_connector.next_cursor(results, sort_key))
+            if not handle_pagination(results, display_utils.display_films_table,
+                                     lambda film_id: show_film_details(conn, film_id)):
+                break
+            with metrics.action(f'ui.{query_type}.next_page'):
+                results = prefetcher.result()
+    finally:
+        prefetcher.close()
 
 
-def handle_pagination(results: list, offset: int, display_function: callable) -> bool:
+def handle_pagination(results: list, display_function: callable,
+                      open_details: callable = None) -> bool:
     '''
     Displays the current results and offers to show the next page.
+    If open_details is given, the user can also open a film by its ID;
+    open_details receives the entered ID.
     Returns True if the user wants to continue.
     '''
 
-    page_size = 10
+    page_size = mysql_connector.PAGE_SIZE
 
     if not results:
         print('No more results.')
@@ -211,26 +269,53 @@ def handle_pagination(results: list, offset: int, display_function: callable) ->
 
     display_function(results)
 
-    if len(results) < page_size:
+    has_more = len(results) >= page_size
+    if not has_more:
         print('\nAll results have been displayed.')
-        return False
+        if open_details is None:
+            return False
+
+    while True:
+        if has_more:
+            print(display_utils.colorize(f'\nShow the next {page_size} results?', 'yellow'))
+            print(display_utils.colorize('1 - Yes', 'blue'))
+        else:
+            print(display_utils.colorize('\nOpen a film?', 'yellow'))
+        print(display_utils.colorize('2 - No', 'blue'))
+        if open_details is not None:
+            print(display_utils.colorize('3 - Open film details', 'blue'))
+        choice = input('Your choice: ').strip()
+
+        if choice == '3' and open_details is not None:
+            open_details(input('Enter film ID: ').strip())
+            continue
+        return has_more and choice == '1'
+
 
-    print(display_utils.colorize(f'\nShow the next {page_size} results?', 'yellow'))
-    print(display_utils.colorize('1 - Yes', 'blue'))
-    print(display_utils.colorize('2 - No', 'blue'))
-    choice = input('Your choice: ').strip()
-    return choice == '1'
+@metrics.instrument(action_label='ui.film_details')
+def show_film_details(conn, film_id: str) -> None:
+    '''Loads one film with its full description and actors, and displays it.'''
+
+    if not film_id.isdigit():
+        print('\nInvalid film ID.')
+        return
+    display_utils.display_film_details(mysql_connector.get_film_details(conn, int(film_id)))
 
 
 @errors.log_error(display=True)
 def handle_stat_menu() -> None:
     '''Displays the statistics menu and handles user choice.'''
 
+    import log_stats
+
     print(f'{display_utils.colorize("\n=== Statistics ===", "yellow")}\n')
     print(f'{display_utils.colorize("1. Top 5 popular queries", "blue")}')
     print(f'{display_utils.colorize("2. Last 5 queries", "blue")}')
     print(f'{display_utils.colorize("3. Search queries by type", "blue")}')
-    print(f'{display_utils.colorize("4. Frequency by query type", "blue")}\n')
+    print(f'{display_utils.colorize("4. Frequency by query type", "blue")}')
+    print(f'{display_utils.colorize("5. Search result cache", "blue")}')
+    print(f'{display_utils.colorize("6. Latency metrics", "blue")}')
+    print(f'{display_utils.colorize("7. Query rates over time", "blue")}\n')
 
     stat_choice = input('Choose an option: ').strip()
 
@@ -245,7 +330,7 @@ def handle_stat_menu() -> None:
         display_utils.display_queries_table(last)
 
     elif stat_choice == '3':
-        type_name = input('Enter query type (keyword, genre_year, actor_name, length_range): ').strip()
+        type_name = input('Enter query type (keyword, genre_year, actor_name, length_range, combined): ').strip()
         filtered = log_stats.get_queries_by_type(type_name)
         print(f'\nQueries of type "{type_name}":')
         display_utils.display_queries_table(filtered)
@@ -253,5 +338,24 @@ def handle_stat_menu() -> None:
     elif stat_choice == '4':
         log_stats.handle_query_count(show=True)
 
+    elif stat_choice == '5':
+        print('\nSearch result cache:')
+        display_utils.display_stats_table(result_cache.stats())
+
+    elif stat_choice == '6':
+        if not metrics.enabled():
+            print('\nMetrics are disabled (set METRICS_ENABLED=1).')
+        else:
+            print('\nLatency metrics:')
+            display_utils.display_stats_table(metrics.summary())
+
+    elif stat_choice == '7':
+        unit = input('Per minute (last hour), hour (last day) or day (last 30 days)? [hour]: ').strip() or 'hour'
+        if unit not in log_stats.RATE_WINDOWS:
+            print('Invalid time unit.')
+        else:
+            print(f'\nQueries per {unit}:')
+            display_utils.display_query_rates(log_stats.get_query_rates(unit), unit)
+
     else:
         print('Invalid choice.')